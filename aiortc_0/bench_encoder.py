@@ -0,0 +1,119 @@
+import argparse
+import time
+from fractions import Fraction
+
+import av
+import numpy as np
+from aiortc import RTCRtpCodecParameters
+
+from encoder_config import EncoderConfig
+
+# 벤치마크 기본 설정 (client.py와 같은 크기/fps)
+VIDEO_SIZE = (1640, 1232)
+VIDEO_FPS = 10
+NUM_FRAMES = 100
+BITRATE = 1000000  # 모든 설정에 같은 목표 비트레이트를 줘서 인코딩 비용과 실제 비트레이트를 비교
+
+# 비교할 설정: (이름, 코덱, EncoderConfig 인자)
+SETTINGS = [
+    ("vp8 aiortc 기본", "VP8", {}),
+    ("vp8 cpu-used -12", "VP8", {"cpu_used": -12}),
+    ("vp8 1 thread", "VP8", {"threads": 1}),
+    ("vp8 gop 30", "VP8", {"gop": 30}),
+    ("x264 medium (기본)", "H264", {}),
+    ("x264 veryfast", "H264", {"preset": "veryfast"}),
+    ("x264 ultrafast", "H264", {"preset": "ultrafast"}),
+    ("x264 ultrafast 1 thread", "H264", {"preset": "ultrafast", "threads": 1}),
+    ("x264 ultrafast gop 30", "H264", {"preset": "ultrafast", "gop": 30}),
+    ("x264 ultrafast 실제 fps", "H264", {"preset": "ultrafast", "frame_rate": None}),
+]
+
+
+def synthetic_frames(size, num_frames, fps):
+    """
+    움직이는 그라데이션 배경 + 움직이는 사각형 + 약한 센서 노이즈 (완전 랜덤 노이즈는 압축이 안 돼서 실제 영상과 거리가 멂)
+    """
+    width, height = size
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(num_frames):
+        image = ((x + i * 4) % 256 * 0.5 + (y + i * 2) % 256 * 0.5).astype(np.uint8)
+        image = np.stack([image, np.roll(image, width // 3, axis=1), image[::-1]], axis=2)
+        for k in range(4):
+            left = (i * (8 + 4 * k) + k * width // 4) % (width - width // 8)
+            top = (k * height // 4 + i * 3) % (height - height // 8)
+            image[top:top + height // 8, left:left + width // 8] = (60 * k, 255 - 60 * k, 128)
+        image = np.clip(image + rng.normal(0, 2, image.shape), 0, 255).astype(np.uint8)
+        frame = av.VideoFrame.from_ndarray(image, format="bgr24").reformat(format="yuv420p")
+        frame.pts = i
+        frame.time_base = Fraction(1, fps)
+        frames.append(frame)
+    return frames
+
+
+def bench(frames, fps, bitrate, settings):
+    print(f"{frames[0].width}x{frames[0].height} {fps}fps, frames={len(frames)}, 목표 {bitrate / 1000:.0f}kbps")
+    print(f"{'설정':<26} {'wall ms/frame':>14} {'cpu ms/frame':>13} {'max ms':>8} {'kbps':>8} {'키프레임':>8}")
+    for name, codec_name, kwargs in settings:
+        # frame_rate를 지정한 설정만 실제 fps로 (나머지는 aiortc처럼 30 기준)
+        if kwargs.get("frame_rate", 0) is None:
+            kwargs = dict(kwargs, frame_rate=fps)
+        config = EncoderConfig(codec=codec_name, start_bitrate=bitrate, min_bitrate=bitrate, max_bitrate=bitrate,
+                               **kwargs)
+        # RTCRtpSender와 같은 경로: encode()가 코덱을 열고 인코딩 후 RTP 페이로드로 나눔
+        encoder = config.create_encoder(RTCRtpCodecParameters(mimeType=f"video/{codec_name}", clockRate=90000))
+        encoder.encode(frames[0], True)  # 코덱 열기/첫 키프레임은 제외
+        sent = 0
+        keyframes = 0
+        worst = 0.0
+        cpu_start = time.process_time()  # 인코더 내부 스레드까지 포함
+        wall_start = time.perf_counter()
+        for frame in frames[1:]:
+            start = time.perf_counter()
+            payloads, _ = encoder.encode(frame)
+            worst = max(worst, time.perf_counter() - start)
+            sent += sum(len(p) for p in payloads)
+            keyframes += is_keyframe(codec_name, payloads)
+        count = len(frames) - 1
+        wall = (time.perf_counter() - wall_start) / count * 1000
+        cpu = (time.process_time() - cpu_start) / count * 1000
+        kbps = sent * 8 * fps / count / 1000
+        print(f"{name:<26} {wall:>14.2f} {cpu:>13.2f} {worst * 1000:>8.1f} {kbps:>8.0f} {keyframes:>8}")
+
+
+def is_keyframe(codec_name, payloads):
+    if not payloads:
+        return False
+    if codec_name == "VP8":
+        # VP8 payload descriptor 뒤 첫 바이트의 P 비트 (0이면 키프레임), S 비트가 있는 첫 패킷만 봄
+        payload = payloads[0]
+        offset = 1
+        if payload[0] & 0x80:
+            extension = payload[1]
+            offset = 2
+            if extension & 0x80:
+                offset += 2 if payload[offset] & 0x80 else 1
+            offset += bool(extension & 0x40) + bool(extension & 0x30)
+        return not payload[offset] & 0x01
+    # H.264: STAP-A(24) 안이나 단일 NAL로 SPS(7)/IDR(5)가 있으면 키프레임
+    for payload in payloads:
+        nal_type = payload[0] & 0x1F
+        if nal_type == 24 and payload[3] & 0x1F in (5, 7):
+            return True
+        if nal_type in (5, 7) or (nal_type == 28 and payload[1] & 0x1F == 5):
+            return True
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인코더 설정별 프레임당 인코딩 시간/실제 비트레이트 (합성 영상)")
+    parser.add_argument("--size", type=int, nargs=2, default=list(VIDEO_SIZE), metavar=("W", "H"))
+    parser.add_argument("--fps", type=int, default=VIDEO_FPS)
+    parser.add_argument("--frames", type=int, default=NUM_FRAMES)
+    parser.add_argument("--bitrate", type=int, default=BITRATE)
+    parser.add_argument("--only", default=None, help="이름에 이 문자열이 들어간 설정만")
+    args = parser.parse_args()
+
+    settings = [s for s in SETTINGS if args.only is None or args.only in s[0]]
+    bench(synthetic_frames(tuple(args.size), args.frames, args.fps), args.fps, args.bitrate, settings)
@@ -0,0 +1,62 @@
+import argparse
+import time
+
+import av
+import numpy as np
+
+from camera_frames import copy_yuv420
+
+# 벤치마크 기본 설정 (client.py와 같은 크기)
+VIDEO_SIZE = (1640, 1232)
+STRIDE_ALIGN = 64  # 카메라 버퍼 행 정렬 (바이트), 실제 버퍼처럼 행 끝에 패딩을 둠
+NUM_FRAMES = 50
+
+
+def align(n):
+    return (n + STRIDE_ALIGN - 1) // STRIDE_ALIGN * STRIDE_ALIGN
+
+
+def xbgr_path(buffer, width, height):
+    # 기존 경로: make_array 복사 -> 채널 슬라이스 -> bgr24 복사 -> 인코더 입력용 yuv420p 변환
+    frame_np = np.array(buffer).reshape(height, -1)[:, :width * 4].reshape(height, width, 4)
+    frame_np = frame_np[:, :, 2::-1]
+    frame = av.VideoFrame.from_ndarray(frame_np, format="bgr24")
+    frame.reformat(format="yuv420p")
+    return frame_np.size // 3 * 4 + frame_np.size
+
+
+def yuv420_path(buffer, width, height):
+    # 새 경로: 매핑된 YUV420 버퍼 -> yuv420p 평면 복사 한 번 (인코더의 reformat은 변환 없이 그대로 통과)
+    frame = av.VideoFrame(width, height, "yuv420p")
+    copied = copy_yuv420(buffer, frame)
+    frame.reformat(format="yuv420p")
+    return copied
+
+
+def bench(size, num_frames):
+    width, height = size
+    rng = np.random.default_rng(0)
+    xbgr = rng.integers(0, 256, size=(height, align(width * 4)), dtype=np.uint8)
+    yuv = rng.integers(0, 256, size=(height * 3 // 2, align(width)), dtype=np.uint8)
+
+    print(f"{width}x{height}, frames={num_frames}")
+    print(f"{'경로':>10} {'복사 MB/frame':>14} {'wall ms/frame':>14} {'cpu ms/frame':>13}")
+    for name, fn, buffer in (("XBGR8888", xbgr_path, xbgr), ("YUV420", yuv420_path, yuv)):
+        fn(buffer, width, height)  # 워밍업
+        copied = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        for _ in range(num_frames):
+            copied += fn(buffer, width, height)
+        cpu = (time.thread_time() - cpu_start) / num_frames * 1000
+        wall = (time.perf_counter() - wall_start) / num_frames * 1000
+        print(f"{name:>10} {copied / num_frames / 1e6:>14.2f} {wall:>14.2f} {cpu:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PiCameraTrack 프레임 래핑 경로별 복사량/CPU (인코딩 제외)")
+    parser.add_argument("--size", type=int, nargs=2, default=list(VIDEO_SIZE), metavar=("W", "H"))
+    parser.add_argument("--frames", type=int, default=NUM_FRAMES)
+    args = parser.parse_args()
+
+    bench(tuple(args.size), args.frames)
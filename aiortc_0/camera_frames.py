@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def copy_yuv420(src, frame):
+    """
+    Picamera2 YUV420(I420) 버퍼를 yuv420p VideoFrame의 평면에 그대로 복사한다 (색공간 변환/채널 재배치 없음).
+    src는 (height * 3 / 2, stride) uint8이고 행마다 stride 패딩이 있을 수 있으므로 평면별로 한 번씩만 복사한다.
+    복사한 바이트 수를 반환한다.
+    """
+    width, height = frame.width, frame.height
+    flat = src.reshape(-1)
+    stride = src.shape[1]
+    y_size = height * stride
+    uv_stride = stride // 2
+    uv_size = (height // 2) * uv_stride
+
+    planes = (
+        flat[:y_size].reshape(height, stride)[:, :width],
+        flat[y_size:y_size + uv_size].reshape(height // 2, uv_stride)[:, :width // 2],
+        flat[y_size + uv_size:y_size + 2 * uv_size].reshape(height // 2, uv_stride)[:, :width // 2],
+    )
+
+    copied = 0
+    for plane, plane_src in zip(frame.planes, planes):
+        dst = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)
+        dst[:plane_src.shape[0], :plane_src.shape[1]] = plane_src
+        copied += plane_src.nbytes
+    return copied
+
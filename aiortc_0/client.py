@@ -7,9 +7,14 @@ import cv2
 
 from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
 from aiortc.contrib.media import MediaRelay
+from aiortc.mediastreams import MediaStreamError
 from fractions import Fraction  # Python 내장 모듈
 
-from picamera2 import Picamera2
+from picamera2 import MappedArray, Picamera2
+
+from camera_frames import copy_yuv420
+from capture_thread import CaptureThread
+from encoder_config import EncoderConfig, add_encoder_arguments, config_from_args
 
 # try:
 #     picam_available = True
@@ -18,53 +23,141 @@ from picamera2 import Picamera2
 
 logging.basicConfig(level=logging.INFO)
 
+# 카메라 설정
+VIDEO_SIZE = (1640, 1232)  # 보내는 해상도 그대로 ISP에서 맞춰 받음
+CAPTURE_FORMAT = "YUV420"  # "YUV420": 인코더 입력(yuv420p)과 같은 배치로 캡처, "XBGR8888": 기존 경로 (비교용)
+VIDEO_FPS = 10  # 카메라 FrameRate로 설정해서 센서가 프레임 간격을 맞춤
+VIDEO_CLOCK_RATE = 90000  # RTP 비디오 클럭, pts 단위
+VIDEO_TIME_BASE = Fraction(1, VIDEO_CLOCK_RATE)
+MAX_STALE_DROPS = 3  # recv 한 번에 밀린 프레임을 최대 이만큼 버리고 최신 프레임을 기다림
+REPORT_INTERVAL = 100  # 이 프레임 수마다 fps/drop/지연/복사량/CPU 로그 (10fps 기준 10초)
+
 class PiCameraTrack(MediaStreamTrack):
     kind = "video"
 
-    def __init__(self, camera, fps=25):
+    def __init__(self, camera, fps=VIDEO_FPS, capture_format=CAPTURE_FORMAT):
         super().__init__()  # 꼭 호출
         self.camera = camera
         self.fps = fps
-        self.start_time = time.time()
+        self.capture_format = capture_format
         self.frame_count = 0
-        self.start_time = None  # 시작 시간 기록
-
-    async def recv(self):
-        if self.start_time == None:
-            self.start_time = time.monotonic()  # 시작 시간 기록
-
-        # picamera2에서 프레임(numpy array) 추출
-        # frame_np = self.camera.capture_array()
+        self.first_timestamp = None  # 첫 프레임의 SensorTimestamp (ns), pts 기준점
+        self.min_age = None  # 지금까지 본 가장 작은 캡처->전달 지연 (카메라 파이프라인 기본 지연)
+        # 프레임당 복사량/CPU 측정용 (캡처+래핑은 이 스레드, 인코딩은 aiortc 워커 스레드에서 수행)
+        self.copied_bytes = 0
+        self.wrap_cpu = 0.0
+        self.process_cpu_start = None
+        # REPORT_INTERVAL 프레임마다 로그로 내보내고 초기화하는 구간 통계
+        self.window_start = None
+        self.window_frames = 0
+        self.window_drops = 0  # recv에서 본 슬롯 덮어쓰기 (이벤트 루프에서만 갱신)
+        self.window_age = 0.0
+        self.window_max_age = 0.0
+        # 밀린 요청을 버린 누적 수: 캡처 스레드만 올리고 report()는 지난 값과의 차이만 읽음 (초기화하지 않아 경합 없음)
+        self.stale_drops = 0
+        self.reported_stale_drops = 0
+        # 캡처는 별도 스레드에서 하고 recv()는 최신 프레임 슬롯을 기다리기만 함 (이벤트 루프를 막지 않음)
+        self.seq = 0  # 마지막으로 보낸 캡처 번호
+        self.capture = CaptureThread(self.capture_frame, slots=1, name="picamera").start()
+
+    def capture_fresh_request(self):
+        """
+        다음 캡처 요청과 SensorTimestamp(ns)를 받는다. 파이프라인 기본 지연을 빼고도 한 프레임 간격보다 오래된 요청은
+        밀린 프레임이므로 버리고 다음(더 최신) 요청을 받는다. SensorTimestamp는 time.monotonic_ns()와 같은 시계다.
+        """
+        interval_ns = 1_000_000_000 // self.fps
         request = self.camera.capture_request()
-        frame_np = request.make_array("main")  # NumPy 변환 대신 최소한의 데이터만 사용
-        request.release()  # 메모리 해제 (중요)
-        # aiortc가 쓰는 av.VideoFrame으로 변환
-        frame_np = frame_np[:, :, 2::-1]  # X(패딩) 채널 제거하고 BGR만 유지
-        # frame_np = cv2.cvtColor(frame_np, cv2.COLOR_XBGR2BGR)
-        # frame_np = cv2.resize(frame_np, (640, 480), interpolation=cv2.INTER_LINEAR)
-
-        video_frame = av.VideoFrame.from_ndarray(frame_np, format='bgr24')
+        timestamp = request.get_metadata()["SensorTimestamp"]
+        for _ in range(MAX_STALE_DROPS):
+            age = time.monotonic_ns() - timestamp
+            if self.min_age is None or age < self.min_age:
+                self.min_age = age
+            if age - self.min_age <= interval_ns:
+                break
+            request.release()
+            self.stale_drops += 1
+            request = self.camera.capture_request()
+            timestamp = request.get_metadata()["SensorTimestamp"]
+        return request, timestamp
+
+    def capture_frame(self):
+        """캡처 스레드에서 호출: 다음 요청을 VideoFrame으로 감싸서 (프레임, SensorTimestamp) 반환"""
+        cpu_start = time.thread_time()
+        request, timestamp = self.capture_fresh_request()
+        try:
+            if self.capture_format == "YUV420":
+                # 카메라 버퍼를 복사 없이 매핑하고 yuv420p 평면으로 한 번만 복사 (인코더에서 색공간 변환 없음)
+                width, height = self.camera.camera_config["main"]["size"]
+                video_frame = av.VideoFrame(width, height, "yuv420p")
+                with MappedArray(request, "main") as mapped:
+                    self.copied_bytes += copy_yuv420(mapped.array, video_frame)
+            else:
+                frame_np = request.make_array("main")  # 카메라 버퍼 전체 복사
+                # aiortc가 쓰는 av.VideoFrame으로 변환
+                frame_np = frame_np[:, :, 2::-1]  # X(패딩) 채널 제거하고 BGR만 유지 (연속되지 않은 view라 아래에서 한 번 더 복사)
+                video_frame = av.VideoFrame.from_ndarray(frame_np, format='bgr24')
+                self.copied_bytes += frame_np.size // 3 * 4 + frame_np.size  # XBGR 복사 + bgr24 복사
+        finally:
+            request.release()  # 메모리 해제 (중요)
+        self.wrap_cpu += time.thread_time() - cpu_start
+        return video_frame, timestamp
 
-        # 타임스탬프 관련 설정
-        video_frame.pts = self.frame_count
-        video_frame.time_base = Fraction(1, self.fps)
-
-        # 원하는 FPS에 맞추어 sleep
+    async def recv(self):
+        if self.window_start is None:
+            self.window_start = time.monotonic()
+            self.process_cpu_start = time.process_time()
+
+        found = await self.capture.get(self.seq, latest=True)
+        if found is None:
+            raise MediaStreamError
+        seq, (video_frame, timestamp) = found
+        if self.seq:
+            self.window_drops += seq - self.seq - 1  # 슬롯에서 덮어써져 보내지 못한 프레임
+        self.seq = seq
+
+        # 타임스탬프: 센서 노출 시각 기준이라 캡처가 밀리거나 프레임을 버려도 실제 시간 간격이 그대로 전달됨
+        # 프레임 간격은 카메라 FrameRate 설정이 맞추므로 여기서 따로 sleep하지 않음
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        video_frame.pts = (timestamp - self.first_timestamp) * VIDEO_CLOCK_RATE // 1_000_000_000
+        video_frame.time_base = VIDEO_TIME_BASE
+
+        age = (time.monotonic_ns() - timestamp) / 1e9
         self.frame_count += 1
-        expected_time = self.start_time + (self.frame_count / self.fps)
-        now = time.monotonic()
-        delay = max(0, expected_time - now)  # 시간이 밀리면 sleep을 0으로 설정하여 보정
-        real_fps = 1 / ((now - self.start_time) / self.frame_count)
-        
-        # 원하는 FPS에 맞추어 sleep (보정된 시간)
-        if delay > 0:
-            await asyncio.sleep(delay)
-        # await asyncio.sleep(1 / self.fps)
-      
-        print('video: ', frame_np.shape, "count:", self.frame_count, "delay:", round(delay, 2), "fps:", round(real_fps, 4))
+        self.window_frames += 1
+        self.window_age += age
+        self.window_max_age = max(self.window_max_age, age)
+        if self.frame_count % REPORT_INTERVAL == 0:
+            self.report()
         return video_frame
 
-async def run_client(server_url):
+    def stop(self):
+        super().stop()
+        self.capture.stop()
+
+    def report(self):
+        now = time.monotonic()
+        # 프로세스 CPU에는 인코더의 색공간 변환/인코딩 비용까지 포함된다
+        process_cpu = time.process_time() - self.process_cpu_start
+        stale_drops = self.stale_drops
+        drops = self.window_drops + stale_drops - self.reported_stale_drops
+        self.reported_stale_drops = stale_drops
+        logging.info(
+            f"[{self.capture_format}] frames={self.frame_count} "
+            f"fps={self.window_frames / (now - self.window_start):.2f} "
+            f"drops={drops} "
+            f"age avg={self.window_age / self.window_frames * 1000:.1f}ms max={self.window_max_age * 1000:.1f}ms "
+            f"copy={self.copied_bytes / self.frame_count / 1e6:.2f}MB/frame "
+            f"capture+wrap cpu={self.wrap_cpu / self.frame_count * 1000:.2f}ms/frame "
+            f"process cpu={process_cpu / self.frame_count * 1000:.2f}ms/frame"
+        )
+        self.window_start = now
+        self.window_frames = 0
+        self.window_drops = 0
+        self.window_age = 0.0
+        self.window_max_age = 0.0
+
+async def run_client(server_url, capture_format=CAPTURE_FORMAT, encoder_config=None):
     # WebRTC PC 생성
     pc = RTCPeerConnection()
 
@@ -79,7 +172,9 @@ async def run_client(server_url):
 
     camera = Picamera2()
     # 해상도/포맷 등 원하는 설정
-    camera.configure(camera.create_video_configuration(main={"size": (1640, 1232)}))  # XBGR8888
+    # YUV420은 ISP가 보낼 크기로 바로 만들어 주고 인코더 입력(yuv420p)과 배치가 같아 채널 재배치/변환이 필요 없음
+    camera.configure(camera.create_video_configuration(main={"size": VIDEO_SIZE, "format": capture_format},
+                                                       controls={"FrameRate": VIDEO_FPS}))
     # picam2.configure(picam2.create_preview_configuration(main={
     #     "size": (820, 616), "format": 'XRGB8888'
     # }))
@@ -94,10 +189,12 @@ async def run_client(server_url):
     camera.start()
 
     # 직접 구현한 PiCameraTrack 생성
-    camera_track = PiCameraTrack(camera, fps=10)
+    camera_track = PiCameraTrack(camera, fps=VIDEO_FPS, capture_format=capture_format)
 
-    # 카메라 트랙을 WebRTC에 추가
-    pc.addTrack(camera_track)
+    # 카메라 트랙을 WebRTC에 추가하고 오퍼 전에 트랜시버의 코덱 선호 순서 설정
+    sender = pc.addTrack(camera_track)
+    encoder_config = encoder_config or EncoderConfig(frame_rate=VIDEO_FPS).install()
+    encoder_config.apply(next(t for t in pc.getTransceivers() if t.sender is sender))
 
     # Offer 생성 및 설정
     offer = await pc.createOffer()
@@ -125,6 +222,7 @@ async def run_client(server_url):
         pass
     finally:
         await pc.close()
+        camera_track.stop()  # 캡처 스레드를 먼저 멈춘 뒤 카메라 정지
         camera.stop()
 
 def main():
@@ -132,9 +230,14 @@ def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--server", default=f"http://{ip}:5002")
+    parser.add_argument("--capture-format", default=CAPTURE_FORMAT, choices=["YUV420", "XBGR8888"],
+                        help="카메라 캡처 포맷 (복사량/CPU 비교용)")
+    add_encoder_arguments(parser)
+    parser.set_defaults(frame_rate=VIDEO_FPS)  # x264 레이트 컨트롤을 실제 fps 기준으로
     args = parser.parse_args()
 
-    asyncio.run(run_client(args.server))
+    encoder_config = config_from_args(args).install()
+    asyncio.run(run_client(args.server, args.capture_format, encoder_config))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
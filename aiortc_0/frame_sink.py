@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+from aiortc.mediastreams import MediaStreamError
+
+logger = logging.getLogger(__name__)
+
+# 분석 기본 설정
+SINK_WORKERS = 1  # 분석 워커 스레드 수
+SINK_POLICY = "latest"  # "latest": 워커가 바쁘면 가장 최근 프레임 하나만 대기, "bounded": max_pending개까지 순서대로 대기
+SINK_MAX_PENDING = 4  # bounded 정책에서 대기할 수 있는 최대 프레임 수 (넘치면 새 프레임을 버림)
+SINK_FORMAT = "bgr24"  # 워커에 넘길 배열 형식: "bgr24" (h, w, 3), "gray" (h, w), "yuv420p" (h * 3 / 2, w)
+
+
+def yuv420p_to_buffer(frame, out):
+    """yuv420p VideoFrame의 Y/U/V 평면을 (h * 3 / 2, w) I420 버퍼에 stride를 빼고 한 번씩 복사"""
+    width, height = frame.width, frame.height
+    y_plane, u_plane, v_plane = frame.planes
+    out[:height] = np.frombuffer(y_plane, np.uint8).reshape(-1, y_plane.line_size)[:height, :width]
+    chroma = out[height:].reshape(-1)
+    size = (height // 2) * (width // 2)
+    for i, plane in enumerate((u_plane, v_plane)):
+        src = np.frombuffer(plane, np.uint8).reshape(-1, plane.line_size)[:height // 2, :width // 2]
+        chroma[i * size:(i + 1) * size].reshape(height // 2, width // 2)[:] = src
+
+
+class FrameSink:
+    """
+    원격 트랙에서 프레임을 계속 꺼내고(aiortc 수신 큐가 쌓이지 않게) 분석 워커 풀에 넘긴다.
+    이벤트 루프는 디코딩된 프레임을 받아 대기열에 넣기만 하고, numpy 변환은 워커가 자기 버퍼에 한 번만 한다.
+    워커가 모두 바쁘면 policy에 따라 최신 프레임만 남기거나(latest) 제한된 대기열에 넣고 넘치면 버리므로
+    처리가 늦어도 메모리는 (워커 수 + 대기 수) 프레임을 넘지 않고, 버린 프레임은 변환 비용도 들지 않는다.
+    handler(image, frame_time)의 image는 워커별로 재사용하는 버퍼라 호출이 끝나면 다음 프레임으로 덮어써진다.
+    """
+
+    def __init__(self, track, handler, workers=SINK_WORKERS, policy=SINK_POLICY, max_pending=SINK_MAX_PENDING,
+                 format=SINK_FORMAT):
+        self.track = track
+        self.handler = handler
+        self.format = format
+        self.pending = deque(maxlen=1 if policy == "latest" else max_pending)
+        self.policy = policy
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.threads = [threading.Thread(target=self.work, name=f"sink-{i}", daemon=True) for i in range(workers)]
+
+        # 통계
+        self.received = 0
+        self.processed = 0
+        self.skipped = 0  # 워커가 바빠서 처리하지 못하고 버린 프레임
+        self.errors = 0
+        self.busy = 0.0  # 워커들이 handler + 변환에 쓴 시간 합 (초)
+
+    async def run(self):
+        """트랙이 끝날 때까지 프레임을 받아 워커에 넘긴다 (asyncio 태스크로 실행)"""
+        for thread in self.threads:
+            thread.start()
+        try:
+            while True:
+                try:
+                    frame = await self.track.recv()
+                except MediaStreamError:
+                    break
+                self.offer(frame)
+        finally:
+            self.stop()
+
+    def offer(self, frame):
+        with self.condition:
+            self.received += 1
+            if len(self.pending) == self.pending.maxlen:
+                self.skipped += 1
+                if self.policy != "latest":
+                    return  # bounded: 대기열이 차 있으면 새 프레임을 버림
+                # latest: deque가 가장 오래된 대기 프레임을 밀어냄
+            self.pending.append(frame)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def work(self):
+        buffers = {}  # 이 워커가 재사용하는 배열 (이름 -> ndarray)
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.stopped)
+                if not self.pending:
+                    return
+                frame = self.pending.popleft()
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                self.handler(self.convert(frame, buffers), frame.time)
+            except Exception as e:
+                failed = True
+                logger.warning(f"프레임 분석 오류: {e}")
+            with self.condition:
+                self.errors += failed
+                self.processed += 1
+                self.busy += time.perf_counter() - start
+
+    def convert(self, frame, buffers):
+        """frame을 워커 버퍼에 한 번 변환해 넣고 그 버퍼를 반환한다. 크기가 바뀌었을 때만 버퍼를 새로 만든다"""
+        width, height = frame.width, frame.height
+
+        def buffer(name, shape):
+            array = buffers.get(name)
+            if array is None or array.shape != shape:
+                array = buffers[name] = np.empty(shape, np.uint8)
+            return array
+
+        if frame.format.name != "yuv420p":
+            # 디코더가 yuv420p가 아닌 형식을 내면 PyAV 변환 결과를 버퍼로 복사
+            array = frame.to_ndarray(format=self.format)
+            out = buffer("image", array.shape)
+            np.copyto(out, array)
+            return out
+
+        if self.format == "gray":
+            out = buffer("image", (height, width))
+            y_plane = frame.planes[0]
+            out[:] = np.frombuffer(y_plane, np.uint8).reshape(-1, y_plane.line_size)[:height, :width]
+            return out
+
+        if self.format == "yuv420p":
+            out = buffer("image", (height * 3 // 2, width))
+            yuv420p_to_buffer(frame, out)
+            return out
+
+        # bgr24: I420 평면을 모은 뒤 OpenCV로 버퍼에 바로 변환
+        i420 = buffer("i420", (height * 3 // 2, width))
+        yuv420p_to_buffer(frame, i420)
+        out = buffer("image", (height, width, 3))
+        cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420, dst=out)
+        return out
+
+    def stats(self):
+        with self.condition:
+            return {
+                "received": self.received,
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "pending": len(self.pending),
+                "errors": self.errors,
+                "busy_ms_per_frame": round(self.busy / self.processed * 1000, 2) if self.processed else 0.0,
+            }
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from fractions import Fraction
+
+import av
+
+logger = logging.getLogger(__name__)
+
+# aiortc 코덱 이름 -> FFmpeg 코덱 이름
+CODEC_NAMES = {"VP8": "vp8", "H264": "h264"}
+REPORT_INTERVAL = 100  # 이 프레임 수마다 스트림별 녹화 CPU 로그 (10fps 기준 10초)
+
+
+def is_keyframe(codec_name, data):
+    if codec_name == "vp8":
+        return len(data) > 0 and not data[0] & 0x01
+    # H.264 (Annex B): IDR(5) 또는 SPS(7) NAL이 있으면 키프레임
+    start = data.find(b"\x00\x00\x01")
+    while start != -1 and start + 3 < len(data):
+        if data[start + 3] & 0x1F in (5, 7):
+            return True
+        start = data.find(b"\x00\x00\x01", start + 3)
+    return False
+
+
+class DecoderQueueTee:
+    """
+    RTCRtpReceiver가 조립한 인코딩 프레임을 디코더 스레드로 넘기는 큐 대신 끼워서 녹화기로 보낸다.
+    forward가 False면 디코더로는 보내지 않는다 (녹화만 할 때 디코딩 비용도 없앰). None(수신 종료)은 항상 넘긴다.
+    """
+
+    def __init__(self, decoder_queue, recorder, forward=False):
+        self.decoder_queue = decoder_queue
+        self.recorder = recorder
+        self.forward = forward
+
+    def put(self, item, *args, **kwargs):
+        self.recorder.push(item)
+        if item is None or self.forward:
+            self.decoder_queue.put(item, *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        # on_track 시점에는 디코더 스레드가 아직 없어서 스레드가 이 객체를 큐로 받아감
+        return self.decoder_queue.get(*args, **kwargs)
+
+
+class PassthroughRecorder:
+    """
+    수신한 RTP 미디어를 다시 인코딩하지 않고 인코딩된 프레임 그대로 원래 RTP 타임스탬프로 컨테이너에 쓴다.
+    컨테이너가 해당 코덱을 담을 수 없을 때만 (예: mp4에 VP8) 디코딩 후 다시 인코딩하는 경로로 바꾼다.
+    먹싱/트랜스코딩은 스트림마다 별도 스레드에서 하므로 스레드 CPU 시간이 곧 스트림별 녹화 비용이다.
+    """
+
+    def __init__(self, path, forward=False):
+        self.path = path
+        self.forward = forward
+        self.queue = queue.Queue()
+        self.thread = None
+        self.container = None
+        self.stream = None
+        self.mode = None  # "passthrough" 또는 "transcode"
+        self.decoder = None
+        self.time_base = None  # RTP 클럭 (컨테이너가 스트림 time_base를 바꿔도 패킷은 이 단위로 넘김)
+        self.last_pts = None
+
+        # 통계
+        self.frames = 0
+        self.skipped = 0  # 첫 키프레임 전 프레임, 타임스탬프가 거꾸로 간 프레임
+        self.bytes = 0
+        self.cpu = 0.0
+        self.start_time = None
+
+    def attach(self, receiver):
+        """receiver의 디코더 큐 자리에 tee를 끼우고 녹화 스레드를 시작한다"""
+        attr = "_RTCRtpReceiver__decoder_queue"
+        setattr(receiver, attr, DecoderQueueTee(getattr(receiver, attr), self, self.forward))
+        self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+        self.thread.start()
+
+    def push(self, item):
+        # 이벤트 루프(RTP 수신)에서 호출, 실제 작업은 녹화 스레드에서
+        self.queue.put(item)
+
+    async def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
+            self.thread = None
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            codec, encoded_frame = item
+            cpu_start = time.thread_time()
+            try:
+                self.write(codec, encoded_frame)
+            except Exception as e:
+                logger.error(f"녹화 오류: {e}")
+                break
+            self.cpu += time.thread_time() - cpu_start
+            if self.frames and self.frames % REPORT_INTERVAL == 0:
+                self.report()
+        self.close()
+
+    def open(self, codec, encoded_frame):
+        codec_name = CODEC_NAMES.get(codec.name, codec.name.lower())
+        self.time_base = Fraction(1, codec.clockRate)
+        # 크기는 첫 키프레임을 한 번 디코딩해서 얻음 (컨테이너 헤더에 필요)
+        self.decoder = av.CodecContext.create(codec_name, "r")
+        self.decoder.thread_count = 1  # 녹화 스레드 CPU 시간으로 비용을 잴 수 있게 한 스레드로
+        frames = self.decoder.decode(av.Packet(encoded_frame.data))
+        if not frames:
+            return False
+        width, height = frames[0].width, frames[0].height
+
+        self.container = av.open(self.path, "w")
+        try:
+            self.stream = self.container.add_stream(codec_name)
+            self.mode = "passthrough"
+            self.decoder = None
+        except ValueError:
+            # 이 컨테이너에 담을 수 없는 코덱: 원래 MediaRecorder처럼 다시 인코딩
+            encoder = "libvpx" if self.container.format.name == "webm" else "libx264"
+            self.stream = self.container.add_stream(encoder)
+            self.stream.pix_fmt = "yuv420p"
+            self.stream.codec_context.thread_count = 1
+            # 인코더 기본 time_base(1/24)로 반올림되면 pts가 겹치므로 RTP 클럭 그대로 씀
+            self.stream.codec_context.time_base = self.time_base
+            self.mode = "transcode"
+            logger.warning(f"{self.container.format.name}에 {codec_name}을 그대로 담을 수 없어 {encoder}로 다시 인코딩")
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.time_base = self.time_base
+        self.start_time = time.monotonic()
+        logger.info(f"녹화 시작: {self.path} ({codec_name} {width}x{height}, {self.mode})")
+        return True
+
+    def write(self, codec, encoded_frame):
+        data = encoded_frame.data
+        codec_name = CODEC_NAMES.get(codec.name, codec.name.lower())
+        keyframe = is_keyframe(codec_name, data)
+        if self.container is None and (not keyframe or not self.open(codec, encoded_frame)):
+            self.skipped += 1  # 첫 키프레임부터 녹화
+            return
+
+        pts = encoded_frame.timestamp
+        if self.last_pts is not None and pts <= self.last_pts:
+            self.skipped += 1
+            return
+        self.last_pts = pts
+
+        packet = av.Packet(data)
+        packet.pts = packet.dts = pts
+        packet.time_base = self.time_base
+        if self.mode == "passthrough":
+            packet.is_keyframe = keyframe
+            packet.stream = self.stream
+            self.container.mux(packet)
+        else:
+            for frame in self.decoder.decode(packet):
+                frame.pts = pts
+                frame.time_base = self.time_base
+                for out in self.stream.encode(frame):
+                    self.container.mux(out)
+        self.frames += 1
+        self.bytes += len(data)
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        logger.info(
+            f"[{self.mode}] {self.path} frames={self.frames} skipped={self.skipped} "
+            f"recv={self.bytes * 8 / elapsed / 1000:.0f}kbps "
+            f"cpu={self.cpu / self.frames * 1000:.2f}ms/frame ({self.cpu / elapsed * 100:.1f}% of a core)"
+        )
+
+    def close(self):
+        if self.container is None:
+            return
+        if self.mode == "transcode":
+            for out in self.stream.encode(None):
+                self.container.mux(out)
+        self.container.close()
+        self.container = None
+        if self.frames:
+            self.report()
@@ -4,10 +4,46 @@ import logging
 
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription
-from aiortc.contrib.media import MediaRecorder
+from aiortc.contrib.media import MediaRecorder, MediaRelay
+
+from encoder_config import VIDEO_CODEC, EncoderConfig
+from frame_sink import SINK_POLICY, SINK_WORKERS, FrameSink
+from recorder import PassthroughRecorder
 
 logging.basicConfig(level=logging.INFO)
 pcs = set()  # PeerConnection 관리를 위한 집합
+recorders = set()  # 종료 시 파일을 마무리할 녹화기
+
+# 녹화 설정
+RECORD_FILE = "received_video.mkv"  # mkv는 VP8/H.264를 모두 그대로 담을 수 있음 (mp4에 VP8이면 다시 인코딩)
+RECORD_MODE = "passthrough"  # "passthrough": 받은 인코딩 프레임을 그대로 저장, "transcode": 기존 MediaRecorder
+
+# 분석 설정
+ANALYZE = False  # True면 수신 영상을 numpy 배열로 analyze_frame에 넘김 (워커가 바쁘면 프레임을 건너뜀)
+ANALYZE_WORKERS = SINK_WORKERS
+ANALYZE_POLICY = SINK_POLICY
+
+# 코덱 협상 설정 (받기만 하므로 인코더 설정은 쓰지 않고 answer에서 먼저 고를 코덱만)
+CODEC_CONFIG = EncoderConfig(codec=VIDEO_CODEC)
+
+
+def analyze_frame(image, frame_time):
+    """
+    서버 측 영상 분석 자리 (워커 스레드에서 호출). image는 재사용 버퍼라 보관하려면 복사해야 한다
+    """
+    logging.debug(f"analyze t={frame_time} shape={image.shape}")
+
+
+def start_analysis(track):
+    sink = FrameSink(track, analyze_frame, workers=ANALYZE_WORKERS, policy=ANALYZE_POLICY)
+
+    async def run():
+        await sink.run()
+        print(f"Analysis stats: {sink.stats()}")
+
+    asyncio.ensure_future(run())
+    return sink
+
 
 async def offer(request):
     """
@@ -30,10 +66,23 @@ async def offer(request):
     @pc.on("track")
     async def on_track(track):
         print(f"Track kind={track.kind} is received")
-        if track.kind == "video":
-            # 수신된 영상을 mp4로 파일에 저장(내부적으로 ffmpeg 사용)
-            recorder = MediaRecorder("received_video.mp4")
-            recorder.addTrack(track)
+        if track.kind == "video" and RECORD_MODE == "passthrough":
+            # 디코딩/재인코딩 없이 받은 프레임을 그대로 저장 (컨테이너가 코덱을 못 담을 때만 다시 인코딩)
+            receiver = next(t.receiver for t in pc.getTransceivers() if t.receiver.track is track)
+            # 분석할 때만 디코더로도 넘김
+            recorder = PassthroughRecorder(RECORD_FILE, forward=ANALYZE)
+            recorder.attach(receiver)
+            recorders.add(recorder)
+            if ANALYZE:
+                start_analysis(track)
+        elif track.kind == "video":
+            # 수신된 영상을 파일에 저장(내부적으로 디코딩 후 ffmpeg로 다시 인코딩)
+            # 분석도 하면 relay로 나눠서 녹화와 분석이 서로의 프레임을 가져가지 않게 함
+            relay = MediaRelay() if ANALYZE else None
+            recorder = MediaRecorder(RECORD_FILE)
+            recorder.addTrack(relay.subscribe(track) if relay else track)
+            if relay:
+                start_analysis(relay.subscribe(track))
             await recorder.start()
 
             @track.on("ended")
@@ -41,6 +90,10 @@ async def offer(request):
                 print("Video track ended")
                 await recorder.stop()
 
+    # 받기 전용 비디오 트랜시버를 미리 만들어 선호 코덱을 정해 둠
+    # (setRemoteDescription이 오퍼의 비디오를 이 트랜시버에 붙이면서 이 순서로 코덱을 고름)
+    CODEC_CONFIG.apply(pc.addTransceiver("video", direction="recvonly"))
+
     # 클라이언트 Offer 설정
     offer_obj = RTCSessionDescription(sdp=offer_sdp, type=offer_type)
     await pc.setRemoteDescription(offer_obj)
@@ -64,9 +117,27 @@ async def on_shutdown(app):
     coros = [pc.close() for pc in pcs]
     await asyncio.gather(*coros)
     pcs.clear()
+    # 수신이 끝나면 녹화 스레드가 파일을 닫으므로 그때까지 기다림
+    await asyncio.gather(*[recorder.stop() for recorder in recorders])
+    recorders.clear()
 
 
 def main():
+    global RECORD_FILE, RECORD_MODE, ANALYZE, ANALYZE_WORKERS, ANALYZE_POLICY, CODEC_CONFIG
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", default=RECORD_FILE, help="녹화 파일 경로 (확장자로 컨테이너 결정)")
+    parser.add_argument("--record-mode", default=RECORD_MODE, choices=["passthrough", "transcode"])
+    parser.add_argument("--analyze", action="store_true", help="수신 영상을 analyze_frame으로 분석")
+    parser.add_argument("--analyze-workers", type=int, default=ANALYZE_WORKERS)
+    parser.add_argument("--analyze-policy", default=ANALYZE_POLICY, choices=["latest", "bounded"],
+                        help="워커가 바쁠 때 최신 프레임만 남길지(latest), 제한된 대기열에 쌓을지(bounded)")
+    parser.add_argument("--codec", default=VIDEO_CODEC, choices=["VP8", "H264"], help="answer에서 먼저 고를 비디오 코덱")
+    args = parser.parse_args()
+    RECORD_FILE, RECORD_MODE = args.record, args.record_mode
+    ANALYZE, ANALYZE_WORKERS, ANALYZE_POLICY = args.analyze, args.analyze_workers, args.analyze_policy
+    CODEC_CONFIG = EncoderConfig(codec=args.codec)
+
     app = web.Application()
     app.on_shutdown.append(on_shutdown)
     # /offer 라우팅
@@ -0,0 +1,100 @@
+# 같은 파일이 aiortc_0, aiortc_1, aiortc_2, withpipe2에 복사되어 있음: 예제 디렉터리마다 그 안에서 스크립트를 따로 실행하므로
+# 공용 패키지 대신 복사본을 둔다. 고칠 때는 모든 복사본을 똑같이 고칠 것
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ERROR_BACKOFF = 0.1  # 캡처 함수가 예외를 내면 이만큼 쉬고 다시 시도 (초)
+
+
+class CaptureThread:
+    """
+    blocking 캡처 함수(capture_request, capture_array, stream.read 등)를 별도 스레드에서 계속 호출하고
+    결과를 최근 slots개만 (번호, 항목)으로 보관한다. 트랙의 recv()는 await get()으로 기다렸다가 감싸기만 하므로
+    느린 센서 읽기가 이벤트 루프(다른 트랙의 RTP/RTCP)를 막지 않는다.
+    소비자마다 마지막으로 받은 번호를 들고 있으므로 여러 소비자가 같은 캡처를 공유할 수 있다.
+    영상은 latest=True로 가장 최근 항목만(slots=1이면 최신 프레임 슬롯), 오디오는 짧은 링에서 순서대로 꺼낸다.
+    """
+
+    def __init__(self, capture, slots=1, name="capture"):
+        self.capture = capture  # 인자 없이 호출해서 항목을 돌려주는 함수 (None이면 건너뜀)
+        self.items = deque(maxlen=slots)
+        self.name = name
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.waiters = []  # (loop, asyncio.Event): 새 항목이 들어오면 깨울 소비자
+        self.seq = 0  # 마지막으로 캡처한 항목 번호 (1부터)
+
+        # 통계
+        self.errors = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.wake()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                item = self.capture()
+            except Exception as e:
+                if self.stop_event.is_set():
+                    break
+                self.errors += 1
+                logger.warning(f"{self.name} 캡처 오류: {e}")
+                time.sleep(ERROR_BACKOFF)
+                continue
+            if item is None:
+                continue
+            with self.lock:
+                self.seq += 1
+                self.items.append((self.seq, item))
+            self.wake()
+
+    def wake(self):
+        with self.lock:
+            waiters, self.waiters = self.waiters, []
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 소비자 이벤트 루프가 이미 닫힘
+
+    def take(self, after, latest):
+        # 잠금은 호출한 쪽에서
+        if not self.items or self.items[-1][0] <= after:
+            return None
+        if latest:
+            return self.items[-1]
+        for seq, item in self.items:
+            if seq > after:
+                return seq, item
+
+    async def get(self, after=0, latest=False):
+        """
+        after번 다음에 캡처된 (번호, 항목)을 기다려 돌려준다. latest면 가장 최근 항목, 아니면 남아 있는 것 중 가장 오래된 항목.
+        돌려받은 번호와 after 사이의 빈 번호는 소비가 늦어 건너뛴 항목이다. 멈췄으면 None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            # 확인과 대기 등록을 같은 잠금 안에서 해야 그 사이에 들어온 항목을 놓치지 않음
+            with self.lock:
+                found = self.take(after, latest)
+                if found is not None:
+                    return found
+                if self.stop_event.is_set():
+                    return None
+                self.waiters.append((loop, event))
+            await event.wait()
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import time, fractions
 import numpy as np
@@ -5,8 +6,18 @@ import pyaudio
 import aiohttp
 
 from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
 from av import AudioFrame, VideoFrame
 
+from capture_thread import CaptureThread
+from encoder_config import EncoderConfig, add_encoder_arguments, config_from_args
+
+MIC_SLOTS = 10  # 마이크 캡처 스레드가 보관하는 청크 수 (0.4초), recv가 이보다 늦으면 오래된 청크부터 버림
+FRAME_RATE = 25  # 오디오/비디오 동기 전송 fps
+SERVER_URL = "http://localhost:5555/offer"
+# 비디오 인코더 설정 (코덱 선호 순서, 비트레이트 범위, GOP, preset 등은 encoder_config.py 참고, 실행 시 명령행 인자로 다시 만듦)
+ENCODER_CONFIG = EncoderConfig(frame_rate=FRAME_RATE)
+
 
 # 오디오+비디오 전송 간 25fps(40ms) 맞추기 위한 동기 도우미
 class SyncTimer:
@@ -40,13 +51,22 @@ class AudioStreamTrack(MediaStreamTrack):
             input=True,
             frames_per_buffer=self.chunk
         )
+        # blocking read는 캡처 스레드에서 하고 recv는 링에서 순서대로 꺼내기만 함
+        self.chunks = CaptureThread(
+            lambda: self.stream.read(self.chunk, exception_on_overflow=False),
+            slots=MIC_SLOTS, name="microphone"
+        ).start()
+        self.seq = 0
 
     async def recv(self):
         # 프레임 동기: 25fps에 맞춰 40ms 간격
         await asyncio.sleep(self.sync.get_wait_time())
 
         # 오디오 캡처
-        audio_data = self.stream.read(self.chunk, exception_on_overflow=False)
+        found = await self.chunks.get(self.seq)
+        if found is None:
+            raise MediaStreamError
+        self.seq, audio_data = found
 
         # aiortc용 AudioFrame 생성
         frame = AudioFrame(format="s16", layout="mono", samples=self.chunk)
@@ -58,6 +78,13 @@ class AudioStreamTrack(MediaStreamTrack):
 
         return frame
 
+    def stop(self):
+        super().stop()
+        self.chunks.stop()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pa.terminate()
+
 
 class DummyVideoStreamTrack(MediaStreamTrack):
     kind = "video"
@@ -81,14 +108,16 @@ class DummyVideoStreamTrack(MediaStreamTrack):
         return frame
 
 
-async def run_client():
+async def run_client(server_url=SERVER_URL):
     # 클라이언트 PeerConnection 생성
     pc = RTCPeerConnection()
 
     # 오디오·비디오 동시에 25fps로 동기 전송
-    sync_timer = SyncTimer(frame_rate=25)
+    sync_timer = SyncTimer(frame_rate=FRAME_RATE)
     pc.addTrack(AudioStreamTrack(sync_timer))
-    pc.addTrack(DummyVideoStreamTrack(sync_timer))
+    video_sender = pc.addTrack(DummyVideoStreamTrack(sync_timer))
+    # 오퍼 전에 비디오 트랜시버의 코덱 선호 순서 설정
+    ENCODER_CONFIG.apply(next(t for t in pc.getTransceivers() if t.sender is video_sender))
 
     # Offer 생성
     offer = await pc.createOffer()
@@ -96,7 +125,7 @@ async def run_client():
 
     # 서버에 Offer 전송
     async with aiohttp.ClientSession() as session:
-        async with session.post("http://localhost:5555/offer", json={
+        async with session.post(server_url, json={
             "sdp": pc.localDescription.sdp,
             "type": pc.localDescription.type
         }) as resp:
@@ -113,4 +142,10 @@ async def run_client():
     await asyncio.Future()
 
 if __name__ == "__main__":
-    asyncio.run(run_client())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", default=SERVER_URL, help="Offer를 보낼 서버 주소")
+    add_encoder_arguments(parser)
+    parser.set_defaults(frame_rate=FRAME_RATE)  # x264 레이트 컨트롤을 실제 fps 기준으로
+    args = parser.parse_args()
+    ENCODER_CONFIG = config_from_args(args).install()
+    asyncio.run(run_client(args.server))
\ No newline at end of file
@@ -1,9 +1,14 @@
+import argparse
 import asyncio
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription
 from aiortc.contrib.media import MediaRecorder
 
+from encoder_config import VIDEO_CODEC, EncoderConfig
+
 pcs = set()  # 연결된 PeerConnection 보관 (단일 클라이언트만 필요해도 예시로 세트 사용)
+# 코덱 협상 설정 (받기만 하므로 answer에서 먼저 고를 비디오 코덱만, 실행 시 명령행 인자로 다시 만듦)
+codec_config = EncoderConfig(codec=VIDEO_CODEC)
 
 
 async def offer(request):
@@ -44,6 +49,9 @@ async def offer(request):
             await recorder.stop()
             pcs.discard(pc)
 
+    # 받기 전용 비디오 트랜시버를 미리 만들어 선호 코덱을 정해 둠 (Offer 설정 때 이 순서로 코덱을 고름)
+    codec_config.apply(pc.addTransceiver("video", direction="recvonly"))
+
     # Offer 설정
     await pc.setRemoteDescription(session)
 
@@ -62,6 +70,11 @@ async def offer(request):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--codec", default=VIDEO_CODEC, choices=["VP8", "H264"], help="answer에서 먼저 고를 비디오 코덱")
+    args = parser.parse_args()
+    codec_config = EncoderConfig(codec=args.codec)
+
     app = web.Application()
     app.router.add_post("/offer", offer)
     web.run_app(app, port=5555)
\ No newline at end of file
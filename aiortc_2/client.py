@@ -5,10 +5,14 @@ import websockets
 
 from aiortc import RTCIceCandidate, RTCPeerConnection, RTCSessionDescription
 from aiortc.contrib.signaling import BYE
-from aiortc.mediastreams import AudioStreamTrack
+from aiortc.mediastreams import AudioStreamTrack, MediaStreamError
 from av import AudioFrame
 import numpy as np
 
+from capture_thread import CaptureThread
+
+MIC_SLOTS = 8  # 마이크 캡처 스레드가 보관하는 청크 수 (1024샘플 기준 ~0.5초), 넘치면 오래된 청크부터 버림
+
 
 # PyAudio에서 16kHz PCM 데이터를 읽어오는 Track 정의
 class PyAudioTrack(AudioStreamTrack):
@@ -28,10 +32,19 @@ class PyAudioTrack(AudioStreamTrack):
             input=True,
             frames_per_buffer=self.chunk,
         )
+        # blocking read는 캡처 스레드에서 하고 recv는 링에서 순서대로 꺼내기만 함
+        self.chunks = CaptureThread(
+            lambda: self.stream.read(self.chunk, exception_on_overflow=False),
+            slots=MIC_SLOTS, name="microphone"
+        ).start()
+        self.seq = 0
 
     async def recv(self):
         # PyAudio에서 PCM 데이터 읽어오기
-        data = self.stream.read(self.chunk, exception_on_overflow=False)
+        found = await self.chunks.get(self.seq)
+        if found is None:
+            raise MediaStreamError
+        self.seq, data = found
 
         # (chunk x 채널) x int16 => numpy array로 변환
         audio_array = np.frombuffer(data, dtype=np.int16)
@@ -43,6 +56,7 @@ class PyAudioTrack(AudioStreamTrack):
 
     def stop(self):
         super().stop()
+        self.chunks.stop()
         if self.stream is not None:
             self.stream.stop_stream()
             self.stream.close()
@@ -86,6 +100,7 @@ async def send_offer_and_media(ws_uri: str):
         finally:
             print("클라이언트: 종료.")
             await pc.close()
+            local_audio_track.stop()
 
 
 if __name__ == "__main__":
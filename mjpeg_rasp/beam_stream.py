@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from collections import deque
+from fractions import Fraction
+
+from beamform import CHUNK, RATE, Beamformer, find_input_devices
+
+MAX_BLOCKS = 25  # 소비되지 않은 출력 블록을 이만큼까지 보관 (1초), 넘으면 가장 오래된 것부터 버림
+
+
+class BeamformerStream:
+    """
+    마이크 캡처 + 빔포밍을 별도 스레드에서 돌리고 결과 블록을 크기 제한 큐에 넣는다.
+    소비 쪽은 read() (스레드 안전, 블로킹), 동기 for 문, async for 문 중 편한 것으로 꺼내면 된다.
+    소비가 늦어도 캡처 스레드는 멈추지 않고 큐에서 가장 오래된 블록을 버리므로 장치 overflow로 번지지 않는다.
+    블록은 (캡처 시각, 데이터)이고 데이터는 output="numpy"면 (CHUNK,) int16, "frame"이면 av.AudioFrame이다.
+    """
+
+    def __init__(self, device_indices=None, max_blocks=MAX_BLOCKS, output="numpy", rate=RATE, chunk=CHUNK):
+        self.device_indices = device_indices
+        self.output = output
+        self.rate = rate
+        self.chunk = chunk
+        self.blocks = deque()
+        self.max_blocks = max_blocks
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.p = None
+        self.capture = None
+        self.beamformer = None
+        self.waiters = []  # (loop, asyncio.Event): 블록이 들어오면 깨울 async 소비자
+
+        # 통계
+        self.produced = 0
+        self.dropped = 0  # 큐가 가득 차서 버린 블록 수
+        self.pts = 0  # 출력 샘플 번호 (AudioFrame pts)
+
+    def start(self):
+        # 장치가 필요한 부분만 늦게 import (beamform.main과 같은 이유)
+        import pyaudio
+        from mic_capture import MicCapture
+
+        self.p = pyaudio.PyAudio()
+        if self.device_indices is None:
+            self.device_indices = find_input_devices(self.p)
+        if len(self.device_indices) < 2:
+            self.p.terminate()
+            raise RuntimeError("USB 마이크 2개 이상 필요")
+        self.beamformer = Beamformer(len(self.device_indices), n=self.chunk)
+        self.capture = MicCapture(self.p, self.device_indices, rate=self.rate, chunk=self.chunk)
+        self.capture.start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.capture is not None:
+            self.capture.stop()
+        if self.p is not None:
+            self.p.terminate()
+        self.wake()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            block = self.capture.read(self.chunk, timeout=0.5)
+            if block is None:
+                continue
+            capture_time, data = block
+            self.push(capture_time, self.beamformer.process(data))
+
+    def push(self, capture_time, samples):
+        """빔포밍된 블록을 큐에 넣는다 (캡처 스레드에서 호출)"""
+        with self.condition:
+            if len(self.blocks) >= self.max_blocks:
+                self.blocks.popleft()
+                self.dropped += 1
+            self.blocks.append((capture_time, self.pts, samples))
+            self.pts += len(samples)
+            self.produced += 1
+            self.condition.notify_all()
+        self.wake()
+
+    def wake(self):
+        with self.condition:
+            waiters, self.waiters = self.waiters, []
+            self.condition.notify_all()
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 소비자 이벤트 루프가 이미 닫힘
+
+    def convert(self, item):
+        capture_time, pts, samples = item
+        if self.output != "frame":
+            return capture_time, samples
+        from av import AudioFrame
+
+        frame = AudioFrame.from_ndarray(samples[None, :], format="s16", layout="mono")
+        frame.sample_rate = self.rate
+        frame.time_base = Fraction(1, self.rate)
+        frame.pts = pts
+        return capture_time, frame
+
+    def read(self, timeout=None):
+        """다음 블록을 꺼낸다. timeout 안에 없거나 멈췄으면 None (스레드 안전)"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.blocks or self.stop_event.is_set(), timeout):
+                return None
+            if not self.blocks:
+                return None
+            item = self.blocks.popleft()
+        return self.convert(item)
+
+    def read_nowait(self):
+        with self.condition:
+            item = self.blocks.popleft() if self.blocks else None
+        return None if item is None else self.convert(item)
+
+    def __iter__(self):
+        while not self.stop_event.is_set():
+            block = self.read(timeout=0.5)
+            if block is not None:
+                yield block
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = asyncio.Event()
+            # 꺼내기와 대기 등록을 같은 잠금 안에서 해야 그 사이에 들어온 블록을 놓치지 않고,
+            # 다른 소비자(read/__iter__)가 먼저 가져가도 등록 없이 기다리는 일이 없음
+            with self.condition:
+                item = self.blocks.popleft() if self.blocks else None
+                if item is None:
+                    if self.stop_event.is_set():
+                        raise StopAsyncIteration
+                    self.waiters.append((loop, event))
+            if item is not None:
+                return self.convert(item)
+            await event.wait()
+
+    def stats(self):
+        with self.condition:
+            stats = {
+                "produced": self.produced,
+                "dropped": self.dropped,
+                "queued": len(self.blocks),
+            }
+        if self.capture is not None:
+            stats["capture"] = self.capture.stats()
+        return stats
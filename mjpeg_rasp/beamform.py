@@ -1,103 +1,437 @@
 import numpy as np
-import pyaudio
-from scipy.signal import correlate, resample
+from scipy.fft import rfft, irfft, next_fast_len
+
+from vad import StreamingVad
 
 CHUNK = 640  # 0.04초 (25fps)
 RATE = 16000  # 샘플링 주파수
-CHANNELS = 1
-FORMAT = pyaudio.paInt16
 MAX_SHIFT = int(RATE * 0.01)  # ±10ms 보정 범위 (160샘플)
-DRIFT_WINDOW = 100  # drift 평균 계산용 chunk 수 (~4초)
-DRIFT_THRESHOLD = 0.5  # 평균 delay가 이 이상이면 drift 보정
-
-drift_log = []
+DRIFT_WINDOW = 100  # 클럭 skew 직선 맞춤에 쓰는 chunk 수 (~4초)
+DRIFT_THRESHOLD = 0.5  # skew가 확실하지 않을 때, 평균 delay가 현재 보정값과 이 이상 차이 나야 보정값을 옮김
+SKEW_MIN_POINTS = 25  # 직선 맞춤을 믿기 시작하는 최소 chunk 수 (1초)
+SKEW_MIN_T = 4.0  # 기울기 / 표준오차가 이 이상이어야 실제 drift로 봄
+OUTLIER_SAMPLES = 2.0  # 맞춘 직선(확실하지 않으면 평균)에서 이만큼 넘게 벗어난 delay 추정은 버림
+OUTLIER_MIN_POINTS = 5  # 이상치 판정을 시작하는 최소 chunk 수
+FILTER_TAPS = 16  # 소수 지연 보간 필터 탭 수 (8탭은 Nyquist 근처 감쇠로 소수 지연에서 빔포밍 이득을 ~3dB 잃음)
+CORRELATE_TAPS = 8  # np.correlate가 빠른 경로를 타는 최대 커널 길이, 긴 필터는 이 길이로 나눠서 더함
+MAX_SEGMENTS = 8  # 지연이 움직이는 chunk를 같은 위상 구간으로 나눠 FIR로 처리하는 최대 구간 수
+FILTER_PHASES = 64  # 폴리페이즈 필터 위상 수 (1/64 샘플 해상도)
+MAX_SLEW = 1.0  # chunk 하나 동안 바꿀 수 있는 최대 지연 변화 (샘플), 클릭 방지
+REFINE_STEPS = 1  # 포물선 보간 뒤 상호 스펙트럼에서 상관 최대점을 뉴턴법으로 다듬는 횟수
+PEAK_MIN = 0.2  # GCC-PHAT 최대값이 이보다 작으면 (묵음/잡음뿐인 chunk) 지연 추정을 쓰지 않음
+VAD_MODE = "off"  # "off" 모두 전송, "marker" 묵음 chunk는 빈 데이터(묵음 표시)로 전송, "drop" 묵음 chunk는 보내지 않음
+# "marker"는 받는 쪽이 빈 chunk를 묵음 표시로 처리할 때만 사용 (기존 수신기는 모르는 메시지)
 
 
 # === 송신 함수 ===
 def send_beamformed(chunk):
+    if not chunk:
+        print('sending silence marker')
+        return
     print(f'sending {len(chunk)} bytes')
 
 
-# === 시간차 추정 ===
+# === 시간차 추정 (GCC-PHAT) ===
+class GccPhat:
+    """
+    GCC-PHAT으로 두 신호의 시간차를 추정한다. 위상만 남기고(PHAT 가중) 상호상관하므로 잔향에 덜 끌려간다.
+    ±max_shift 지연만 필요하므로 FFT 길이는 전체 선형 상관(2N-1)이 아니라 N + max_shift면 충분하다.
+    FFT 입력 버퍼는 chunk마다 재사용하고, FFT 플랜은 같은 길이에 대해 scipy.fft가 캐시한다.
+    estimate_all()은 (mics, N) 블록의 모든 채널을 0번 채널 기준으로 한 번의 배치 FFT로 추정한다.
+    포물선 보간은 상관 최대점 모양이 포물선이 아니라서 소수 지연에서 ~0.1샘플 치우치므로,
+    상호 스펙트럼으로 연속 상관 함수의 미분을 직접 계산해 뉴턴법으로 다듬는다.
+    채널별 상관 최대값(self.peaks, 0~1)은 추정을 믿을 수 있는지 판단하는 데 쓴다.
+    """
+
+    def __init__(self, n=CHUNK, max_shift=MAX_SHIFT):
+        self.n = n
+        self.max_shift = max_shift
+        self.nfft = next_fast_len(n + max_shift)
+        self.buf = np.zeros((2, self.nfft), dtype=np.float32)
+        self.window = np.empty((1, 2 * max_shift + 1), dtype=np.float32)
+        self.lags = np.zeros(2)
+        self.peaks = np.zeros(2)
+
+        # irfft는 DC/Nyquist 외의 bin을 두 번 더하므로 같은 가중치로 미분
+        bins = self.nfft // 2 + 1
+        omega = 2 * np.pi * np.arange(bins) / self.nfft
+        weight = np.full(bins, 2.0)
+        weight[0] = 1.0
+        if self.nfft % 2 == 0:
+            weight[-1] = 1.0
+        self.omega = omega
+        self.omega1 = (weight * omega).astype(np.float32)
+        self.omega2 = (weight * omega * omega).astype(np.float32)
+
+    def estimate(self, sig1, sig2):
+        """sig1[n + lag] ≈ sig2[n]을 만족하는 lag (샘플, 소수점까지)"""
+        return float(self.estimate_all((sig1, sig2))[1])
+
+    def estimate_all(self, signals):
+        """채널별 lag 배열 (mics,): signals[0][n + lag[k]] ≈ signals[k][n], lag[0] = 0 (내부 버퍼, 다음 호출에서 덮어씀)"""
+        mics = len(signals)
+        if len(self.buf) != mics:
+            self.buf = np.zeros((mics, self.nfft), dtype=np.float32)
+            self.window = np.empty((mics - 1, 2 * self.max_shift + 1), dtype=np.float32)
+            self.lags = np.zeros(mics)
+            self.peaks = np.zeros(mics)
+        self.buf[:, :self.n] = signals
+        spectrum = rfft(self.buf, axis=1)
+        cross = spectrum[0] * np.conj(spectrum[1:])
+        cross /= np.abs(cross) + 1e-12
+        cc = irfft(cross, self.nfft, axis=1)
+
+        # 원형 상관에서 필요한 지연 구간만 [-max_shift, max_shift] 순서로 모음
+        m = self.max_shift
+        self.window[:, :m] = cc[:, -m:]
+        self.window[:, m:] = cc[:, :m + 1]
+
+        # 최대값 양옆으로 포물선을 맞춰 소수 샘플 지연 추정 (채널 수만큼의 스칼라 연산이라 반복문이 더 쌈)
+        peaks = np.argmax(self.window, axis=1)
+        for row, k in enumerate(peaks.tolist()):
+            lag = float(k - m)
+            if 0 < k < 2 * m:
+                y0, y1, y2 = self.window[row, k - 1:k + 2].tolist()
+                denom = y0 - 2 * y1 + y2
+                if denom != 0:
+                    lag += 0.5 * (y0 - y2) / denom
+            self.lags[row + 1] = lag
+            self.peaks[row + 1] = self.window[row, k]
+
+        # cc(τ) = Σ w·Re(C·e^{jωτ}) 의 1, 2차 미분으로 뉴턴법 (정수 최대점 ±1 밖으로 나가면 포물선 값 유지)
+        coarse = self.lags[1:].copy()
+        tau = coarse.copy()
+        for _ in range(REFINE_STEPS):
+            rotated = cross * np.exp(1j * np.outer(tau, self.omega)).astype(np.complex64)
+            d1 = rotated.imag @ self.omega1
+            d2 = rotated.real @ self.omega2
+            tau -= np.divide(d1, d2, out=np.zeros_like(tau), where=d2 != 0)
+        integer = peaks - m
+        self.lags[1:] = np.where(np.abs(tau - integer) <= 1.0, tau, coarse)
+        return self.lags
+
+
+gcc_phat_estimators = {}  # (chunk 길이, max_shift) -> GccPhat
+
+
 def estimate_delay(sig1, sig2, max_shift):
-    corr = correlate(sig1, sig2, mode='full')
-    center = len(corr) // 2
-    lag = np.argmax(corr[center - max_shift: center + max_shift]) - max_shift
-    return lag
+    key = (len(sig1), max_shift)
+    if key not in gcc_phat_estimators:
+        gcc_phat_estimators[key] = GccPhat(*key)
+    return gcc_phat_estimators[key].estimate(sig1, sig2)
+
+
+# === 클럭 skew 추정 ===
+class ClockSkewEstimator:
+    """
+    chunk마다 들어오는 delay 추정값을 시간에 대해 직선으로 맞춰 두 마이크의 클럭 skew(기울기)와 현재 offset을 구한다.
+    고정 크기 링 버퍼와 누적합(Σt, Σd, Σt², Σtd, Σd²)만 갱신하므로 chunk당 O(1)이다.
+    누적합의 반올림 오차가 쌓이지 않도록 버퍼가 한 바퀴 돌 때마다 합을 다시 계산한다.
+    """
+
+    def __init__(self, window=DRIFT_WINDOW, chunk=CHUNK, rate=RATE, min_points=SKEW_MIN_POINTS,
+                 min_t=SKEW_MIN_T, outlier=OUTLIER_SAMPLES):
+        self.window = window
+        self.dt = chunk / rate
+        self.rate = rate
+        self.min_points = min_points
+        self.min_t = min_t
+        self.outlier = outlier
+
+        self.times = np.zeros(window)
+        self.delays = np.zeros(window)
+        self.count = 0  # 버퍼에 든 점 수
+        self.head = 0  # 다음에 쓸 위치
+        self.sums = np.zeros(5)  # Σt, Σd, Σt², Σtd, Σd²
+        self.t = 0.0  # 첫 chunk부터 지난 시간 (초)
+        self.rejected = 0
+        self.consecutive_rejects = 0
+
+    def reset(self):
+        self.count = 0
+        self.head = 0
+        self.sums[:] = 0.0
+        self.consecutive_rejects = 0
+
+    def update(self, delay):
+        """이번 chunk의 delay 추정값을 넣는다. 추정 실패(None)거나 이상치로 버려지면 False"""
+        t = self.t
+        self.t += self.dt
+        if delay is None:
+            self.rejected += 1
+            return False
+        if self.count >= OUTLIER_MIN_POINTS and abs(delay - self.expected(t)) > self.outlier:
+            self.rejected += 1
+            self.consecutive_rejects += 1
+            # 계속 벗어나면 장치가 다시 열리는 등 offset 자체가 바뀐 것으로 보고 새로 시작
+            if self.consecutive_rejects < self.window // 4:
+                return False
+            self.reset()
+        self.consecutive_rejects = 0
+
+        if self.count == self.window:
+            old_t, old_d = self.times[self.head], self.delays[self.head]
+            self.sums -= (old_t, old_d, old_t * old_t, old_t * old_d, old_d * old_d)
+        else:
+            self.count += 1
+        self.times[self.head] = t
+        self.delays[self.head] = delay
+        self.sums += (t, delay, t * t, t * delay, delay * delay)
+        self.head = (self.head + 1) % self.window
+
+        if self.head == 0:
+            ts, ds = self.times, self.delays
+            self.sums[:] = (ts.sum(), ds.sum(), ts @ ts, ts @ ds, ds @ ds)
+        return True
+
+    def fit(self):
+        """(기울기 samples/s, 기울기 표준오차, 평균 시각, 평균 delay)"""
+        n = self.count
+        st, sd, stt, std, sdd = self.sums
+        mean_t, mean_d = st / n, sd / n
+        var_t = stt / n - mean_t * mean_t
+        if n < 3 or var_t <= 0:
+            return 0.0, float("inf"), mean_t, mean_d
+        cov = std / n - mean_t * mean_d
+        slope = cov / var_t
+        residual = max(sdd / n - mean_d * mean_d - slope * cov, 0.0) * n / (n - 2)
+        return slope, float(np.sqrt(residual / (n * var_t))), mean_t, mean_d
+
+    def confident(self):
+        """점이 충분하고 기울기가 잡음보다 확실히 클 때만 True"""
+        if self.count < self.min_points:
+            return False
+        slope, stderr, _, _ = self.fit()
+        return abs(slope) >= self.min_t * stderr
+
+    def predict(self, t=None):
+        slope, _, mean_t, mean_d = self.fit()
+        return mean_d + slope * ((self.t if t is None else t) - mean_t)
+
+    def expected(self, t):
+        return self.predict(t) if self.confident() else self.sums[1] / self.count
 
+    def skew_ppm(self):
+        return self.fit()[0] / self.rate * 1e6 if self.count >= 3 else 0.0
 
-# === 리샘플링 보정 ===
-def resample_with_drift(sig, drift_ratio):
-    new_len = int(len(sig) * (1 + drift_ratio))
-    resampled = resample(sig, new_len)
-    # 길이를 다시 맞춤 (짧으면 pad, 길면 자름)
-    if len(resampled) < len(sig):
-        resampled = np.pad(resampled, (0, len(sig) - len(resampled)), mode='constant')
-    else:
-        resampled = resampled[:len(sig)]
-    return resampled.astype(np.int16)
+    def offset(self):
+        """현재 시점의 delay. skew가 확실하면 직선을 따라 외삽하고, 아니면 구간 평균"""
+        if self.count == 0:
+            return None
+        return self.expected(self.t)
+
+
+# === 스트리밍 소수 지연 정렬 (드리프트 보정) ===
+def polyphase_table(taps=FILTER_TAPS, phases=FILTER_PHASES):
+    """위상별 Hann 창 sinc 보간 계수 (phases + 1, taps). 행 p는 소수 지연 p / phases용"""
+    offsets = np.arange(-taps // 2 + 1, taps // 2 + 1)
+    frac = np.arange(phases + 1)[:, None] / phases
+    t = offsets[None, :] - frac
+    table = np.sinc(t) * (0.5 + 0.5 * np.cos(np.pi * t / (taps / 2)))
+    table /= table.sum(axis=1, keepdims=True)
+    return table.astype(np.float32)
+
+
+class FractionalDelayAligner:
+    """
+    (mics, N) 블록의 채널마다 소수 지연을 적용하는 상태 유지형 필터.
+    chunk 경계를 넘어 입력 기록을 이어 쓰므로 np.roll처럼 샘플이 감기거나 pad로 끊기지 않는다.
+    지연은 chunk 안에서 목표값까지 선형으로 바뀌며(= 1 - Δ지연/N 비율의 연속 리샘플링) 변화량은 MAX_SLEW로 제한한다.
+    음수 지연(앞당겨 읽기)도 처리하려고 모든 채널을 latency 샘플만큼 늦춰서 내보낸다.
+    지연 0인 채널(기준 마이크)은 0번 위상 계수가 단위 임펄스라 그대로 늦춰지기만 한다.
+    """
+
+    def __init__(self, channels=2, n=CHUNK, max_shift=MAX_SHIFT, taps=FILTER_TAPS, phases=FILTER_PHASES,
+                 max_slew=MAX_SLEW):
+        self.channels = channels
+        self.n = n
+        self.max_shift = max_shift
+        self.taps = taps
+        self.phases = phases
+        self.max_slew = max_slew
+        self.table = polyphase_table(taps, phases)
+        self.offsets = np.arange(-taps // 2 + 1, taps // 2 + 1)
+
+        self.latency = max_shift + taps // 2
+        self.history = 2 * max_shift + taps
+        self.buf = np.zeros((channels, self.history + n), dtype=np.float32)
+        self.out = np.empty((channels, n), dtype=np.float32)
+        self.ramp = np.arange(1, n + 1, dtype=np.float64) / n
+        self.base = self.history - self.latency + np.arange(n, dtype=np.float64)
+        self.delay = None  # 채널별 현재 지연 (ref[n + delay] = sig[n] 규약)
+
+    def split(self, positions):
+        """읽기 위치 -> (정수 인덱스, 위상 번호)"""
+        index = np.floor(positions).astype(np.intp)
+        phase = np.rint((positions - index) * self.phases).astype(np.intp)
+        return index, phase
+
+    def fir(self, c, index, coefs, out):
+        """c 채널에서 읽기 위치 index부터 같은 계수로 len(out)개를 보간 (np.correlate 빠른 경로 길이로 나눠서 더함)"""
+        start = index + self.offsets[0]
+        n = len(out)
+        out[:] = np.correlate(self.buf[c, start:start + n + CORRELATE_TAPS - 1], coefs[:CORRELATE_TAPS], 'valid')
+        for j in range(CORRELATE_TAPS, self.taps, CORRELATE_TAPS):
+            part = coefs[j:j + CORRELATE_TAPS]
+            out += np.correlate(self.buf[c, start + j:start + j + n + len(part) - 1], part, 'valid')
+
+    def process(self, signals, target_delays):
+        """latency만큼 늦춰 같은 시점에 맞춘 (channels, N) float32 블록을 반환 (내부 버퍼, 다음 호출에서 덮어씀)"""
+        n = self.n
+        targets = np.clip(np.asarray(target_delays, dtype=np.float64), -self.max_shift, self.max_shift)
+        if self.delay is None:
+            self.delay = targets.copy()
+        step = np.clip(targets - self.delay, -self.max_slew, self.max_slew)
+
+        # 새 chunk를 기록 뒤에 붙임 (버퍼는 고정 크기, 앞쪽은 이전 chunk에서 이어짐)
+        self.buf[:, self.history:] = signals
+
+        # ref[m] = sig[m - delay] 이므로 출력 m은 각 채널의 (m - latency - delay) 위치를 보간해서 읽음
+        # chunk 처음과 끝의 (인덱스, 위상)이 같으면 chunk 내내 같은 계수이므로 FIR 한 번(np.correlate)으로 처리
+        first_index, first_phase = self.split(self.base[0] - self.delay)
+        last_index, last_phase = self.split(self.base[-1] - (self.delay + step))
+        for c in range(self.channels):
+            if last_index[c] - first_index[c] == n - 1 and last_phase[c] == first_phase[c]:
+                self.fir(c, first_index[c], self.table[first_phase[c]], self.out[c])
+                continue
+
+            # 지연이 움직이는 채널: 위상이 같은 구간으로 나눠 구간마다 FIR (drift 보정 중이면 보통 2~3구간)
+            index, phase = self.split(self.base - (self.delay[c] + step[c] * self.ramp))
+            bounds = np.flatnonzero(np.diff(phase) != 0) + 1
+            if len(bounds) < MAX_SEGMENTS:
+                edges = [0] + bounds.tolist() + [n]
+                for begin, end in zip(edges[:-1], edges[1:]):
+                    self.fir(c, index[begin], self.table[phase[begin]], self.out[c, begin:end])
+            else:
+                # 빠르게 움직이는 중(slew 한계 근처)이면 샘플마다 위상을 골라 탭별로 누적
+                row = self.buf[c]
+                start = index + self.offsets[0]
+                acc = row[start] * self.table[phase, 0]
+                for k in range(1, self.taps):
+                    acc += row[start + k] * self.table[phase, k]
+                self.out[c] = acc
+        self.delay += step
+
+        # 다음 chunk를 위해 기록 보존
+        self.buf[:, :self.history] = self.buf[:, n:]
+        return self.out
 
 
 # === 빔포밍 (Drift 보정 포함) ===
-def beamform_with_drift(sig1, sig2):
-    delay = estimate_delay(sig1, sig2, MAX_SHIFT)
-    drift_log.append(delay)
-    if len(drift_log) > DRIFT_WINDOW:
-        drift_log.pop(0)
+class Beamformer:
+    """
+    (mics, N) int16 블록을 받아 0번 마이크 기준 채널별 지연을 추정하고, 소수 지연 정렬 후 가중합하는 delay-and-sum.
+    지연 추정(배치 FFT)과 합산(weights @ aligned)은 채널 축으로 한 번에 float32로 돌고,
+    채널마다 남는 파이썬 작업은 O(1) skew 추정 갱신과 FIR 한 번뿐이라 비용은 마이크 수에 선형이다.
+    """
+
+    def __init__(self, mics=2, n=CHUNK, max_shift=MAX_SHIFT, weights=None):
+        self.mics = mics
+        self.gcc = GccPhat(n, max_shift)
+        self.aligner = FractionalDelayAligner(mics, n, max_shift)
+        self.estimators = [None] + [ClockSkewEstimator(chunk=n) for _ in range(mics - 1)]
+        if weights is None:
+            weights = np.full(mics, 1.0 / mics)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.targets = np.zeros(mics)
+
+    def targets_from(self, lags):
+        current = self.aligner.delay
+        for k in range(1, self.mics):
+            estimator = self.estimators[k]
+            # 상관 최대값이 낮거나(묵음/잡음뿐) 탐색 구간 끝에 걸리면 실제 지연이 아니라 상관이 안 잡힌 것
+            valid = self.gcc.peaks[k] >= PEAK_MIN and abs(lags[k]) < self.gcc.max_shift - 1
+            estimator.update(lags[k] if valid else None)
+            target = estimator.offset()
+            # skew가 확실하면 직선을 그대로 따라가고, 아니면 평균이 충분히 벗어났을 때만 보정값을 옮김 (추정 잡음으로 흔들리지 않게)
+            if target is None:
+                target = 0.0
+            elif current is not None and not estimator.confident() and abs(target - current[k]) < DRIFT_THRESHOLD:
+                target = current[k]
+            self.targets[k] = target
+        return self.targets
+
+    def process(self, block):
+        """(mics, N) 블록 -> 빔포밍된 (N,) int16"""
+        targets = self.targets_from(self.gcc.estimate_all(block))
+        aligned = self.aligner.process(block, targets)
+        output = self.weights @ aligned
+        np.clip(output, -32768, 32767, out=output)
+        return output.astype(np.int16)
+
+    def report(self):
+        delays = self.aligner.delay if self.aligner.delay is not None else self.targets
+        return ", ".join(
+            f"mic{k} skew {est.skew_ppm():+.1f} ppm offset {delays[k]:+.2f} "
+            f"{'확정' if est.confident() else '대기'} 버린 추정 {est.rejected}"
+            for k, est in enumerate(self.estimators) if est is not None
+        )
+
 
-    drift_avg = np.mean(drift_log)
-    drift_ratio = drift_avg / len(sig1)
+beamformers = {}  # 마이크 수 -> Beamformer
 
-    # drift 크면 보정 수행
-    if abs(drift_avg) >= DRIFT_THRESHOLD:
-        sig2 = resample_with_drift(sig2, drift_ratio)
 
-    aligned2 = np.roll(sig2, -delay)
-    return ((sig1 + aligned2) / 2).astype(np.int16)
+def beamform(block):
+    mics = len(block)
+    if mics not in beamformers:
+        beamformers[mics] = Beamformer(mics)
+    return beamformers[mics].process(block)
+
+
+def beamform_with_drift(sig1, sig2):
+    return beamform(np.stack((sig1, sig2)))
 
 
 # === USB 마이크 인덱스 찾기 ===
-def find_input_devices(p):
+def find_input_devices(p, max_devices=None):
     usb_devices = []
     for i in range(p.get_device_count()):
         info = p.get_device_info_by_index(i)
         if 'USB' in info['name'] and info['maxInputChannels'] >= 1:
             usb_devices.append(i)
-    return usb_devices[:2]
+    return usb_devices[:max_devices] if max_devices else usb_devices
 
 
 # === 메인 루프 ===
 def main(callback_audio):
-    p = pyaudio.PyAudio()
-    dev_idxs = find_input_devices(p)
-    if len(dev_idxs) < 2:
-        print("❌ USB 마이크 2개 필요")
-        return
+    # 장치가 필요한 부분만 늦게 import (시뮬레이터/벤치마크는 PyAudio 없이 돌 수 있게)
+    from beam_stream import BeamformerStream
 
-    stream1 = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True,
-                     input_device_index=dev_idxs[0], frames_per_buffer=CHUNK)
-    stream2 = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True,
-                     input_device_index=dev_idxs[1], frames_per_buffer=CHUNK)
+    # 캡처 + 빔포밍은 별도 스레드에서 돌고, callback_audio가 늦으면 오래된 블록부터 버림
+    stream = BeamformerStream()
+    try:
+        stream.start()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
 
-    print("🎙️  빔포밍 + 드리프트 보정 시작")
+    print(f"🎙️  빔포밍 + 드리프트 보정 시작 (마이크 {len(stream.device_indices)}개)")
 
+    vad = StreamingVad() if VAD_MODE != "off" else None
+    chunks = 0
     try:
-        while True:
-            data1 = np.frombuffer(stream1.read(CHUNK, exception_on_overflow=False), dtype=np.int16)
-            data2 = np.frombuffer(stream2.read(CHUNK, exception_on_overflow=False), dtype=np.int16)
+        for _, output in stream:
+            # 묵음 chunk는 PCM 대신 빈 데이터를 넘겨서 전송량과 받는 쪽 처리를 아낌
+            if vad is None or vad.process(output):
+                callback_audio(output.tobytes())
+            elif VAD_MODE == "marker":
+                callback_audio(b'')
 
-            output = beamform_with_drift(data1, data2)
-            callback_audio(output.tobytes())
+            chunks += 1
+            if chunks % DRIFT_WINDOW == 0:
+                print(f"⏱️  {stream.beamformer.report()}")
+                stats = stream.stats()
+                devices = stats["capture"]["devices"]
+                print("   " + ", ".join(f"dev{d['index']} overflow {d['overflows']} drop {d['dropped']}" for d in devices)
+                      + f", resync {stats['capture']['resyncs']}, 출력 drop {stats['dropped']}")
+                if vad is not None:
+                    print(f"   VAD {vad.stats()}")
 
     except KeyboardInterrupt:
         print("🛑 종료됨")
 
     finally:
-        stream1.stop_stream()
-        stream1.close()
-        stream2.stop_stream()
-        stream2.close()
-        p.terminate()
+        stream.stop()
 
 
 if __name__ == '__main__':
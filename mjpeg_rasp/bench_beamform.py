@@ -0,0 +1,68 @@
+import argparse
+import time
+
+import numpy as np
+
+from beamform import CHUNK, MAX_SHIFT, RATE, Beamformer
+
+# 벤치마크 기본 설정
+MIC_COUNTS = (2, 4, 8)
+NUM_CHUNKS = 300
+
+
+def make_blocks(mics, num_chunks, seed=0):
+    # 같은 백색 잡음을 채널마다 다른 정수 지연으로 잘라 (mics, CHUNK) int16 블록을 만듦
+    rng = np.random.default_rng(seed)
+    source = rng.standard_normal(num_chunks * CHUNK + 2 * MAX_SHIFT)
+    delays = np.concatenate(([0], rng.integers(-MAX_SHIFT // 2, MAX_SHIFT // 2, size=mics - 1)))
+    signals = np.stack([source[MAX_SHIFT + d:MAX_SHIFT + d + num_chunks * CHUNK] for d in delays])
+    signals = (signals * 3000).astype(np.int16)
+    return [signals[:, i * CHUNK:(i + 1) * CHUNK] for i in range(num_chunks)], delays
+
+
+def bench(mic_counts, num_chunks, repeat):
+    chunk_us = CHUNK / RATE * 1e6
+    print(f"chunk={CHUNK} ({chunk_us / 1000:.0f} ms) max_shift={MAX_SHIFT} chunks={num_chunks}")
+    print(f"{'mics':>4} {'전체 us/chunk':>14} {'us/mic':>8} {'GCC-PHAT':>9} {'정렬':>8} {'가중합':>8} {'실시간 대비':>10}")
+
+    for mics in mic_counts:
+        blocks, delays = make_blocks(mics, num_chunks)
+
+        def run(fn):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for block in blocks:
+                    fn(block)
+                best = min(best, time.perf_counter() - start)
+            return best / len(blocks) * 1e6
+
+        total_us = run(Beamformer(mics).process)
+
+        # 단계별 비용 (같은 블록으로 따로 측정)
+        beamformer = Beamformer(mics)
+        gcc_us = run(beamformer.gcc.estimate_all)
+        aligner = beamformer.aligner
+        targets = delays.astype(np.float64)
+        align_us = run(lambda block: aligner.process(block, targets))
+        aligned = aligner.process(blocks[0], targets)
+        sum_us = run(lambda block: beamformer.weights @ aligned)
+
+        # 정렬 결과 확인: 추정 지연이 실제 지연과 맞는지
+        check = Beamformer(mics)
+        for block in blocks[:50]:
+            check.process(block)
+        err = np.max(np.abs(check.aligner.delay - delays))
+
+        print(f"{mics:>4} {total_us:>14.1f} {total_us / mics:>8.1f} {gcc_us:>9.1f} {align_us:>8.1f} {sum_us:>8.1f} "
+              f"{total_us / chunk_us * 100:>9.2f}%  max |delay err|={err:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="N채널 delay-and-sum 빔포머 chunk당 비용")
+    parser.add_argument("--mics", type=int, nargs="+", default=list(MIC_COUNTS))
+    parser.add_argument("--chunks", type=int, default=NUM_CHUNKS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bench(args.mics, args.chunks, args.repeat)
@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import numpy as np
+from scipy.signal import correlate
+
+from beamform import CHUNK, MAX_SHIFT, GccPhat
+
+
+# === 기존 구현 (전체 길이 상호상관) - 비교 기준 ===
+def estimate_delay_xcorr(sig1, sig2, max_shift):
+    corr = correlate(sig1, sig2, mode='full')
+    center = len(corr) // 2
+    lag = np.argmax(corr[center - max_shift: center + max_shift]) - max_shift
+    return lag
+
+
+def make_chunks(num_chunks, delay, seed=0):
+    # 백색 잡음을 delay 샘플만큼 어긋나게 잘라 두 마이크 신호를 만듦 (sig1[n + delay] = sig2[n])
+    rng = np.random.default_rng(seed)
+    source = rng.standard_normal(num_chunks * CHUNK + 2 * MAX_SHIFT)
+    pairs = []
+    for i in range(num_chunks):
+        start = MAX_SHIFT + i * CHUNK
+        sig1 = (source[start:start + CHUNK] * 3000).astype(np.int16)
+        sig2 = (source[start + delay:start + delay + CHUNK] * 3000).astype(np.int16)
+        pairs.append((sig1, sig2))
+    return pairs
+
+
+def bench(num_chunks, delay, repeat):
+    pairs = make_chunks(num_chunks, delay)
+    gcc = GccPhat(CHUNK, MAX_SHIFT)
+
+    def run(fn):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for sig1, sig2 in pairs:
+                fn(sig1, sig2)
+            best = min(best, time.perf_counter() - start)
+        return best / len(pairs) * 1e6
+
+    xcorr_us = run(lambda a, b: estimate_delay_xcorr(a, b, MAX_SHIFT))
+    # int16 그대로 상관을 구하면 오버플로가 나므로 float로 바꾼 기존 방식도 함께 측정
+    xcorr_float_us = run(lambda a, b: estimate_delay_xcorr(a.astype(np.float32), b.astype(np.float32), MAX_SHIFT))
+    gcc_us = run(gcc.estimate)
+
+    xcorr_err = np.mean([abs(estimate_delay_xcorr(a, b, MAX_SHIFT) - delay) for a, b in pairs])
+    gcc_err = np.mean([abs(gcc.estimate(a, b) - delay) for a, b in pairs])
+
+    print(f"chunk={CHUNK} max_shift={MAX_SHIFT} delay={delay} chunks={num_chunks} nfft={gcc.nfft}")
+    print(f"xcorr (기존, int16):   {xcorr_us:8.1f} us/chunk  mean |err|={xcorr_err:.2f}")
+    print(f"xcorr (float32):       {xcorr_float_us:8.1f} us/chunk")
+    print(f"GCC-PHAT (창 제한):    {gcc_us:8.1f} us/chunk  mean |err|={gcc_err:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="시간차 추정 chunk당 비용 비교")
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--delay", type=int, default=23)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bench(args.chunks, args.delay, args.repeat)
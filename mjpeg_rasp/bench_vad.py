@@ -0,0 +1,89 @@
+import argparse
+import time
+import wave
+
+import numpy as np
+
+from beamform import CHUNK, RATE
+from simulate_array import ArraySimulator
+from vad import StreamingVad
+
+# 전송 크기 기준 (mjpegm / websoc 모두 헤더 1+8+4바이트, 묵음 표시 페이로드 2바이트)
+HEADER_BYTES = 13
+MARKER_BYTES = 2
+NUM_CHUNKS = 1500  # 합성 음성 기본 길이 (60초)
+
+
+def load_wav(path):
+    """16bit wav를 int16 (샘플 수,)로 읽는다. 여러 채널이면 첫 채널만 쓴다"""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: 16bit PCM wav만 지원")
+        if f.getframerate() != RATE:
+            print(f"⚠️  {path}: {f.getframerate()} Hz (VAD 설정은 {RATE} Hz 기준)")
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        return samples[::f.getnchannels()]
+
+
+def synthetic_speech(num_chunks, snr_db, seed=0):
+    """
+    simulate_array의 음성 비슷한 음원 (4Hz 음절 + 4초 주기 문장/묵음) 한 채널과 chunk별 정답(문장 구간 여부)
+    """
+    simulator = ArraySimulator(delays=[0], source="speech", snr_db=snr_db, seed=seed)
+    _, signals = simulator.generate(num_chunks)
+    t = (np.arange(num_chunks) + 0.5) * CHUNK / RATE
+    truth = np.sin(2 * np.pi * 0.25 * t) > -0.3
+    return signals[0], truth
+
+
+def run_vad(samples):
+    blocks = len(samples) // CHUNK
+    vad = StreamingVad()
+    decisions = np.empty(blocks, dtype=bool)
+    start = time.perf_counter()
+    for i in range(blocks):
+        decisions[i] = vad.process(samples[i * CHUNK:(i + 1) * CHUNK])
+    elapsed = time.perf_counter() - start
+    return decisions, elapsed / blocks * 1e6
+
+
+def report(name, samples, truth=None):
+    decisions, vad_us = run_vad(samples)
+    blocks = len(decisions)
+    speech = int(decisions.sum())
+    silent = blocks - speech
+    pcm_bytes = HEADER_BYTES + CHUNK * 2
+
+    full = blocks * pcm_bytes
+    marker = speech * pcm_bytes + silent * (HEADER_BYTES + MARKER_BYTES)
+    drop = speech * pcm_bytes
+    seconds = blocks * CHUNK / RATE
+
+    print(f"=== {name}: {seconds:.1f}초, {blocks} chunks ===")
+    print(f"  음성 chunk {speech} ({speech / blocks * 100:.1f}%), 묵음 chunk {silent} ({silent / blocks * 100:.1f}%)")
+    print(f"  전송량  전체 PCM {full / seconds / 1000:.1f} kB/s"
+          f" | marker {marker / seconds / 1000:.1f} kB/s (-{(1 - marker / full) * 100:.1f}%)"
+          f" | drop {drop / seconds / 1000:.1f} kB/s (-{(1 - drop / full) * 100:.1f}%)")
+    print(f"  폰 쪽 향상 모델 실행 -{silent / blocks * 100:.1f}% ({silent} / {blocks} chunk 건너뜀)")
+    print(f"  VAD 비용 {vad_us:.1f} us/chunk (실시간 대비 {vad_us / (CHUNK / RATE * 1e6) * 100:.2f}%)")
+    if truth is not None:
+        truth = truth[:blocks]
+        # 문장 안의 음절 사이 짧은 틈은 hangover로 이어지는 게 정상이라 문장 단위 정답과 비교
+        print(f"  문장 구간 통과율 {decisions[truth].mean() * 100:.1f}%"
+              f", 묵음 구간 차단율 {(~decisions[~truth]).mean() * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VAD 묵음 처리로 아끼는 전송량/수신 쪽 처리량")
+    parser.add_argument("wav", nargs="*", help="녹음 파일 (16kHz 16bit wav), 없으면 합성 음성")
+    parser.add_argument("--chunks", type=int, default=NUM_CHUNKS)
+    parser.add_argument("--snr", type=float, nargs="+", default=[30.0, 20.0, 10.0])
+    args = parser.parse_args()
+
+    if args.wav:
+        for path in args.wav:
+            report(path, load_wav(path))
+    else:
+        for snr in args.snr:
+            samples, truth = synthetic_speech(args.chunks, snr)
+            report(f"합성 음성 SNR {snr:g} dB", samples, truth)
@@ -0,0 +1,179 @@
+import threading
+import time
+
+import numpy as np
+import pyaudio
+
+# 캡처 기본 설정 (beamform.py와 같은 값)
+RATE = 16000
+CHUNK = 640
+BUFFER_SECONDS = 2.0  # 장치별 링 버퍼 길이 (소비가 이보다 늦으면 덮어쓰고 drop으로 집계)
+OFFSET_SMOOTHING = 0.05  # ADC 시각 - 샘플 번호 시각 차이를 따라가는 지수 평활 계수
+RESYNC_SAMPLES = 64  # 타임스탬프로 본 장치 간 어긋남이 이보다 커지면 읽기 위치를 다시 맞춤
+
+
+class MicRing:
+    """
+    한 입력 장치의 PortAudio 콜백을 받아 int16 샘플을 미리 할당한 링 버퍼에 쌓는다.
+    절대 샘플 번호 n은 samples[n % 길이]에 저장하고, 콜백마다 받는 ADC 시각으로
+    샘플 번호 -> 캡처 시각 관계(offset)를 평활해서 유지한다: 시각(n) = n / rate + offset
+    """
+
+    def __init__(self, rate=RATE, buffer_seconds=BUFFER_SECONDS, condition=None):
+        self.rate = rate
+        self.samples = np.zeros(int(buffer_seconds * rate), dtype=np.int16)
+        self.written = 0  # 지금까지 들어온 전체 샘플 수
+        self.offset = None
+        self.condition = condition or threading.Condition()
+
+        # 통계
+        self.callbacks = 0
+        self.overflows = 0  # PortAudio가 알려준 입력 overflow (장치 쪽에서 샘플 유실)
+        self.dropped = 0  # 소비되기 전에 덮어쓴 샘플 수
+        self.jitter = 0.0  # 마지막 콜백의 ADC 시각 - 평활된 예상 시각 (초)
+
+    def callback(self, in_data, frame_count, time_info, status):
+        adc_time = time_info.get('input_buffer_adc_time', 0.0)
+        if not adc_time:
+            # ADC 시각을 주지 않는 호스트 API는 콜백 시각에서 버퍼 길이만큼 뺀 값으로 대신함
+            adc_time = time_info.get('current_time') or time.monotonic()
+            adc_time -= frame_count / self.rate
+        block = np.frombuffer(in_data, dtype=np.int16)
+
+        with self.condition:
+            if status & pyaudio.paInputOverflow:
+                self.overflows += 1
+            measured = adc_time - self.written / self.rate
+            if self.offset is None:
+                self.offset = measured
+            self.jitter = measured - self.offset
+            # 처음에는 누적 평균으로 빨리 수렴시키고 이후엔 지수 평활로 천천히 따라감
+            self.offset += max(OFFSET_SMOOTHING, 1.0 / (self.callbacks + 1)) * self.jitter
+
+            capacity = len(self.samples)
+            start = self.written % capacity
+            first = min(len(block), capacity - start)
+            self.samples[start:start + first] = block[:first]
+            self.samples[:len(block) - first] = block[first:]
+            self.written += len(block)
+            self.callbacks += 1
+            self.condition.notify_all()
+        return None, pyaudio.paContinue
+
+    def time_of(self, n):
+        return n / self.rate + self.offset
+
+    def index_at(self, t):
+        return (t - self.offset) * self.rate
+
+    def copy_to(self, n, out):
+        """절대 샘플 번호 n부터 len(out)개를 out에 복사 (잠금은 호출한 쪽에서)"""
+        capacity = len(self.samples)
+        start = n % capacity
+        first = min(len(out), capacity - start)
+        out[:first] = self.samples[start:start + first]
+        out[first:] = self.samples[:len(out) - first]
+
+
+class MicCapture:
+    """
+    여러 USB 마이크를 콜백 모드로 동시에 열어 장치별 링 버퍼에 쌓고,
+    read()로 같은 캡처 시각에서 시작하는 (장치 수, frames) 블록을 꺼낸다.
+    첫 장치는 샘플을 빠짐없이 이어서 읽고, 나머지 장치는 ADC 타임스탬프로 같은 시각의 샘플 위치를 맞춘다.
+    장치 간 어긋남이 RESYNC_SAMPLES 이내면 읽기 위치를 건드리지 않으므로 클럭 skew는 그대로 남고(빔포머가 보정),
+    순차 read()에서 생기던 임의의 offset만 제거된다.
+    """
+
+    def __init__(self, p, device_indices, rate=RATE, chunk=CHUNK, buffer_seconds=BUFFER_SECONDS,
+                 resync_samples=RESYNC_SAMPLES):
+        self.p = p
+        self.device_indices = list(device_indices)
+        self.rate = rate
+        self.chunk = chunk
+        self.resync_samples = resync_samples
+        self.condition = threading.Condition()
+        self.rings = [MicRing(rate, buffer_seconds, self.condition) for _ in self.device_indices]
+        self.streams = []
+        self.cursors = None  # 장치별 다음에 읽을 절대 샘플 번호
+        self.resyncs = 0
+
+    def start(self):
+        for index, ring in zip(self.device_indices, self.rings):
+            self.streams.append(self.p.open(format=pyaudio.paInt16, channels=1, rate=self.rate, input=True,
+                                            input_device_index=index, frames_per_buffer=self.chunk,
+                                            stream_callback=ring.callback))
+        for stream in self.streams:
+            stream.start_stream()
+
+    def stop(self):
+        for stream in self.streams:
+            stream.stop_stream()
+            stream.close()
+        self.streams = []
+
+    def align(self):
+        # 모든 장치에 남아 있는 가장 이른 공통 시각에서 시작
+        t_start = max(ring.time_of(max(0, ring.written - len(ring.samples))) for ring in self.rings)
+        self.cursors = [int(np.ceil(ring.index_at(t_start))) for ring in self.rings]
+
+    def read(self, frames=None, timeout=1.0):
+        """
+        (첫 샘플 캡처 시각, (장치 수, frames) int16) 블록을 반환한다. timeout 안에 모이지 않으면 None
+        """
+        frames = frames or self.chunk
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if all(ring.offset is not None for ring in self.rings):
+                    if self.cursors is None:
+                        self.align()
+                    self.check_overrun()
+                    self.check_alignment()
+                    if all(ring.written >= cursor + frames for ring, cursor in zip(self.rings, self.cursors)):
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+            block = np.empty((len(self.rings), frames), dtype=np.int16)
+            for i, ring in enumerate(self.rings):
+                ring.copy_to(self.cursors[i], block[i])
+                self.cursors[i] += frames
+            return self.rings[0].time_of(self.cursors[0] - frames), block
+
+    def check_overrun(self):
+        # 소비가 늦어 읽기 위치가 덮어써졌으면 버린 만큼 집계하고 다시 정렬
+        overrun = False
+        for ring, cursor in zip(self.rings, self.cursors):
+            oldest = ring.written - len(ring.samples)
+            if cursor < oldest:
+                ring.dropped += oldest - cursor
+                overrun = True
+        if overrun:
+            self.align()
+
+    def check_alignment(self):
+        t = self.rings[0].time_of(self.cursors[0])
+        for i in range(1, len(self.rings)):
+            expected = self.rings[i].index_at(t)
+            if abs(self.cursors[i] - expected) > self.resync_samples:
+                self.cursors[i] = int(round(expected))
+                self.resyncs += 1
+
+    def stats(self):
+        with self.condition:
+            return {
+                "devices": [
+                    {
+                        "index": index,
+                        "callbacks": ring.callbacks,
+                        "overflows": ring.overflows,
+                        "dropped": ring.dropped,
+                        "buffered": ring.written - cursor if self.cursors else ring.written,
+                        "jitter_ms": round(ring.jitter * 1000, 3),
+                    }
+                    for index, ring, cursor in zip(self.device_indices, self.rings, self.cursors or [0] * len(self.rings))
+                ],
+                "resyncs": self.resyncs,
+            }
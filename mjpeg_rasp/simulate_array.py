@@ -0,0 +1,245 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from scipy.signal import lfilter
+
+from beamform import CHUNK, MAX_SHIFT, RATE, Beamformer, GccPhat, estimate_delay
+
+# 시뮬레이터 기본 설정
+NUM_CHUNKS = 250  # 시나리오당 10초
+INTERP_TAPS = 64  # 소수 지연 생성용 Kaiser 창 sinc 탭 수 (빔포머 쪽 FILTER_TAPS(16탭)보다 충분히 정확하게)
+SOURCE_BANDWIDTH = 0.9  # 음원 대역 (Nyquist 대비), 보간 필터가 정확한 범위 안으로 제한
+SIGNAL_RMS = 3000.0  # int16 기준 음원 크기
+
+# 회귀 판정 기준 (--check)
+MAX_LAG_ERROR = 0.25  # chunk별 지연 추정 오차 중앙값 (샘플)
+MAX_OUTLIER_RATE = 0.05  # 오차 2샘플 넘는 chunk 비율
+MAX_TRACK_ERROR = 0.5  # 마지막 chunk에서 빔포머가 적용 중인 지연 오차 (샘플)
+MAX_SKEW_ERROR = 5.0  # drift가 있는 시나리오의 skew 추정 오차 (ppm)
+SNR_WARMUP_CHUNKS = 25  # SNR 비교에서 빼는 앞쪽 chunk 수 (지연 추적이 자리잡는 동안), 실행 길이와 무관하게 고정
+
+
+def fractional_read(source, positions, taps=INTERP_TAPS):
+    """source를 소수 위치들에서 Kaiser 창 sinc로 보간해서 읽는다"""
+    index = np.floor(positions).astype(np.intp)
+    frac = positions - index
+    offsets = np.arange(-taps // 2 + 1, taps // 2 + 1)
+    t = offsets[None, :] - frac[:, None]
+    kernel = np.sinc(t) * np.kaiser(taps + 1, 8.0)[np.clip(np.round(t + taps / 2).astype(np.intp), 0, taps)]
+    return np.einsum('ij,ij->i', source[index[:, None] + offsets], kernel)
+
+
+class ArraySimulator:
+    """
+    가상 마이크 배열. 같은 음원을 채널별 정수/소수 지연, 클럭 drift(ppm), 독립 잡음을 넣어 int16로 만든다.
+    채널 k의 n번째 샘플은 음원의 (n + delay_k + n * ppm_k * 1e-6) 위치 값이므로
+    beamform의 lag 규약(ref[n + lag] = sig[n])으로 실제 지연은 delay_k + n * ppm_k * 1e-6 이다.
+    0번 채널이 기준이라 delays[0], drift_ppm[0]은 0으로 둔다.
+    """
+
+    def __init__(self, delays, drift_ppm=None, snr_db=20.0, source="noise", rate=RATE, chunk=CHUNK, seed=0):
+        self.delays = np.asarray(delays, dtype=np.float64)
+        self.mics = len(self.delays)
+        self.drift_ppm = np.zeros(self.mics) if drift_ppm is None else np.asarray(drift_ppm, dtype=np.float64)
+        self.snr_db = snr_db
+        self.source_kind = source
+        self.rate = rate
+        self.chunk = chunk
+        self.rng = np.random.default_rng(seed)
+
+    def make_source(self, length):
+        white = self.rng.standard_normal(length)
+        # 대역 제한: 주파수 영역에서 SOURCE_BANDWIDTH 위를 잘라냄
+        spectrum = np.fft.rfft(white)
+        spectrum[int(len(spectrum) * SOURCE_BANDWIDTH):] = 0
+        source = np.fft.irfft(spectrum, length)
+        if self.source_kind == "speech":
+            # 음성 비슷하게: 저역을 키운 스펙트럼 + 4Hz 음절 단위 진폭 변조 + 묵음 구간
+            source = lfilter([1.0], [1.0, -0.9], source)
+            t = np.arange(length) / self.rate
+            envelope = np.clip(np.sin(2 * np.pi * 4 * t) + 0.3, 0, None) * (np.sin(2 * np.pi * 0.25 * t) > -0.3)
+            source *= envelope
+        return source / (np.std(source) + 1e-12)
+
+    def true_delays(self, n):
+        """샘플 번호 n에서의 채널별 실제 지연 (mics,)"""
+        return self.delays + n * self.drift_ppm * 1e-6
+
+    def generate(self, num_chunks):
+        """(clean 기준 채널 float64 (total,), 마이크 신호 int16 (mics, total))"""
+        total = num_chunks * self.chunk
+        margin = MAX_SHIFT + INTERP_TAPS + int(np.max(np.abs(self.drift_ppm)) * 1e-6 * total) + 1
+        source = self.make_source(total + 2 * margin) * SIGNAL_RMS
+        n = np.arange(total, dtype=np.float64)
+        noise_rms = SIGNAL_RMS * 10 ** (-self.snr_db / 20)
+
+        signals = np.empty((self.mics, total), dtype=np.int16)
+        clean = source[margin:margin + total]
+        for k in range(self.mics):
+            positions = margin + n + self.delays[k] + n * self.drift_ppm[k] * 1e-6
+            channel = fractional_read(source, positions) if k else clean.copy()
+            channel += self.rng.standard_normal(total) * noise_rms
+            signals[k] = np.clip(np.round(channel), -32768, 32767)
+        return clean, signals
+
+    def chunks(self, num_chunks):
+        clean, signals = self.generate(num_chunks)
+        for i in range(num_chunks):
+            yield i * self.chunk, signals[:, i * self.chunk:(i + 1) * self.chunk]
+
+
+# === 평가 대상 지연 추정기: 이름 -> (mics, N) 블록을 받아 채널별 lag를 돌려주는 callable을 만드는 함수 ===
+def pairwise_estimate_delay():
+    def run(block):
+        return np.array([0.0] + [estimate_delay(block[0], block[k], MAX_SHIFT) for k in range(1, len(block))])
+    return run
+
+
+ESTIMATORS = {
+    "estimate_delay": pairwise_estimate_delay,
+    "gcc_phat_batch": lambda: GccPhat(CHUNK, MAX_SHIFT).estimate_all,
+}
+
+SCENARIOS = {
+    "integer": dict(delays=[0, 23]),
+    "fractional": dict(delays=[0, 12.35]),
+    "negative": dict(delays=[0, -57.6]),
+    "drift_50ppm": dict(delays=[0, 10.2], drift_ppm=[0, 50]),
+    "drift_-120ppm": dict(delays=[0, -5.5], drift_ppm=[0, -120]),
+    "low_snr": dict(delays=[0, 31.7], snr_db=0.0),
+    "speech": dict(delays=[0, -18.4], source="speech"),
+    "4mic": dict(delays=[0, 7.3, -21.9, 44.1], drift_ppm=[0, 30, -40, 0]),
+    "8mic": dict(delays=[0, 3.1, 9.7, -12.4, 25.5, -33.3, 60.2, -71.8]),
+}
+
+
+def evaluate_estimator(factory, blocks, starts, active, simulator):
+    estimate = factory()
+    start = time.perf_counter()
+    lags = [np.array(estimate(block)) for block in blocks]
+    elapsed = time.perf_counter() - start
+    # 묵음 chunk에서는 맞출 지연이 없으므로 음원이 있는 chunk만 채점
+    # chunk 가운데 시점의 실제 지연과 비교 (drift가 있으면 chunk 안에서도 조금씩 변함)
+    errors = np.concatenate([
+        np.abs(lag[1:] - simulator.true_delays(n + simulator.chunk / 2)[1:])
+        for n, lag, is_active in zip(starts, lags, active) if is_active
+    ])
+    return {
+        "median_error": round(float(np.median(errors)), 4),
+        "p95_error": round(float(np.percentile(errors, 95)), 4),
+        "outlier_rate": round(float(np.mean(errors > 2.0)), 4),
+        "us_per_chunk": round(elapsed / len(blocks) * 1e6, 1),
+    }
+
+
+def evaluate_beamformer(blocks, starts, clean, simulator):
+    beamformer = Beamformer(simulator.mics)
+    outputs = []
+    start = time.perf_counter()
+    for block in blocks:
+        outputs.append(beamformer.process(block))
+    elapsed = time.perf_counter() - start
+    output = np.concatenate(outputs).astype(np.float64)
+
+    # 출력 m은 기준 채널의 (m - latency) 시점이므로 clean 기준 신호를 그만큼 늦춰서 비교 (워밍업 이후만).
+    # 입력 SNR도 같은 구간의 기준 채널로 재서, 음성 포락선의 어느 부분이 구간에 들어가든 이득만 비교되게 함
+    latency = beamformer.aligner.latency
+    first = max(SNR_WARMUP_CHUNKS * simulator.chunk, latency) if len(blocks) > SNR_WARMUP_CHUNKS else len(output) // 2
+    reference = clean[first - latency:len(output) - latency]
+    mic = np.concatenate([block[0] for block in blocks]).astype(np.float64)[first - latency:len(output) - latency]
+    snr_in = 10 * np.log10(np.var(reference) / np.var(mic - reference))
+    snr_out = 10 * np.log10(np.var(reference) / np.var(output[first:] - reference))
+
+    last = starts[-1] + simulator.chunk
+    truth = simulator.true_delays(last)
+    track_error = np.abs(beamformer.aligner.delay[1:] - truth[1:])
+    skew = np.array([est.skew_ppm() for est in beamformer.estimators[1:]])
+    return {
+        "track_error": round(float(track_error.max()), 4),
+        "skew_ppm": [round(float(v), 2) for v in skew],
+        "skew_error_ppm": round(float(np.max(np.abs(skew - simulator.drift_ppm[1:]))), 3),
+        "skew_confident": [bool(est.confident()) for est in beamformer.estimators[1:]],
+        "rejected": [est.rejected for est in beamformer.estimators[1:]],
+        "snr_in_db": round(float(snr_in), 2),
+        "snr_out_db": round(float(snr_out), 2),
+        "us_per_chunk": round(elapsed / len(blocks) * 1e6, 1),
+    }
+
+
+def run_scenario(name, config, num_chunks, seed):
+    simulator = ArraySimulator(seed=seed, **config)
+    clean, signals = simulator.generate(num_chunks)
+    blocks = [signals[:, i * CHUNK:(i + 1) * CHUNK] for i in range(num_chunks)]
+    starts = [i * CHUNK for i in range(num_chunks)]
+    noise_rms = SIGNAL_RMS * 10 ** (-simulator.snr_db / 20)
+    active = [np.std(clean[n:n + CHUNK]) > noise_rms for n in starts]
+    result = {
+        "mics": simulator.mics,
+        "delays": simulator.delays.tolist(),
+        "drift_ppm": simulator.drift_ppm.tolist(),
+        "active_ratio": round(float(np.mean(active)), 3),
+        "estimators": {key: evaluate_estimator(factory, blocks, starts, active, simulator) for key, factory in ESTIMATORS.items()},
+        "beamformer": evaluate_beamformer(blocks, starts, clean, simulator),
+    }
+    return result
+
+
+def check(name, config, result):
+    """판정 기준을 넘은 항목 목록"""
+    failures = []
+    for key, stats in result["estimators"].items():
+        # 저 SNR에서는 chunk 하나짜리 추정이 흔들리는 게 정상이라 빔포머 추적 결과만 봄
+        if config.get("snr_db", 20.0) >= 10.0:
+            if stats["median_error"] > MAX_LAG_ERROR:
+                failures.append(f"{name}/{key}: median lag error {stats['median_error']} > {MAX_LAG_ERROR}")
+            if stats["outlier_rate"] > MAX_OUTLIER_RATE:
+                failures.append(f"{name}/{key}: outlier rate {stats['outlier_rate']} > {MAX_OUTLIER_RATE}")
+    beam = result["beamformer"]
+    if beam["track_error"] > MAX_TRACK_ERROR:
+        failures.append(f"{name}/beamformer: track error {beam['track_error']} > {MAX_TRACK_ERROR}")
+    if any(config.get("drift_ppm", [0])) and beam["skew_error_ppm"] > MAX_SKEW_ERROR:
+        failures.append(f"{name}/beamformer: skew error {beam['skew_error_ppm']} ppm > {MAX_SKEW_ERROR}")
+    if beam["snr_out_db"] < beam["snr_in_db"]:
+        failures.append(f"{name}/beamformer: output SNR {beam['snr_out_db']} dB below input {beam['snr_in_db']} dB")
+    return failures
+
+
+def print_summary(results):
+    print(f"{'scenario':<14} {'estimator':<15} {'med err':>8} {'p95 err':>8} {'outlier':>8} {'us/chunk':>9}")
+    for name, result in results.items():
+        for key, stats in result["estimators"].items():
+            print(f"{name:<14} {key:<15} {stats['median_error']:>8.3f} {stats['p95_error']:>8.3f} "
+                  f"{stats['outlier_rate']:>8.3f} {stats['us_per_chunk']:>9.1f}")
+    print()
+    print(f"{'scenario':<14} {'track err':>9} {'skew ppm':>24} {'SNR in/out dB':>14} {'us/chunk':>9}")
+    for name, result in results.items():
+        beam = result["beamformer"]
+        skew = ",".join(f"{v:+.1f}" for v in beam["skew_ppm"])
+        print(f"{name:<14} {beam['track_error']:>9.3f} {skew:>24} "
+              f"{beam['snr_in_db']:>6.1f}/{beam['snr_out_db']:<7.1f} {beam['us_per_chunk']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가상 마이크 배열로 beamform.py 지연/드리프트 추정 정확도와 속도 측정")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--chunks", type=int, default=NUM_CHUNKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="결과를 저장할 JSON 경로")
+    parser.add_argument("--check", action="store_true", help="판정 기준을 넘으면 종료 코드 1 (CI용)")
+    args = parser.parse_args()
+
+    results = {name: run_scenario(name, SCENARIOS[name], args.chunks, args.seed) for name in args.scenarios}
+    print_summary(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.check:
+        failures = [msg for name in args.scenarios for msg in check(name, SCENARIOS[name], results[name])]
+        for msg in failures:
+            print(f"FAIL {msg}")
+        print("OK" if not failures else f"{len(failures)} check(s) failed")
+        sys.exit(1 if failures else 0)
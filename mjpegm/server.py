@@ -5,6 +5,9 @@ import struct
 import logging
 import pyaudio
 import cv2
+import numpy as np
+
+from vad import StreamingVad
 
 # --- 설정 ---
 HOST = '0.0.0.0'  # 모든 인터페이스에서 연결 허용
@@ -24,6 +27,10 @@ AUDIO_RATE = 16000  # AI 모델이 요구하는 샘플링 레이트로 설정하
 TYPE_VIDEO = 0
 TYPE_AUDIO = 1
 TYPE_ENHANCED_AUDIO = 2  # 폰 -> 파이
+TYPE_AUDIO_SILENCE = 3  # 파이 -> 폰, PCM 대신 보내는 묵음 표시 (페이로드: '!H' 묵음 샘플 수)
+
+# 묵음 처리: "off" 모든 블록 PCM 전송, "marker" 묵음 블록은 TYPE_AUDIO_SILENCE로 대체, "drop" 묵음 블록은 보내지 않음
+AUDIO_VAD_MODE = "off"  # "marker"는 폰 클라이언트가 TYPE_AUDIO_SILENCE를 처리할 때만 사용
 
 # 로깅 설정
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -173,6 +180,7 @@ def audio_stream_thread(sock):
 
     logging.info("오디오 스트리밍 스레드 시작")
     p = pyaudio.PyAudio()
+    vad = None
     try:
         audio_stream_in = p.open(format=AUDIO_FORMAT,
                                  channels=AUDIO_CHANNELS,
@@ -181,12 +189,22 @@ def audio_stream_thread(sock):
                                  frames_per_buffer=AUDIO_CHUNK)
 
         logging.info("오디오 입력 스트림 열림")
+        if AUDIO_VAD_MODE != "off":
+            vad = StreamingVad()
+        silence_marker = struct.pack('!H', AUDIO_CHUNK)
 
         while not stop_event.is_set() and audio_stream_in.is_active():
             ts = time.time_ns()  # 타임스탬프
             try:
                 audio_data = audio_stream_in.read(AUDIO_CHUNK, exception_on_overflow=False)
-                if not send_data(sock, TYPE_AUDIO, ts, audio_data):
+                # 묵음 블록은 PCM 대신 표시만 보내서 대역폭과 폰 쪽 향상 모델 실행을 아낌
+                if vad is None or vad.process(np.frombuffer(audio_data, dtype=np.int16)):
+                    sent = send_data(sock, TYPE_AUDIO, ts, audio_data)
+                elif AUDIO_VAD_MODE == "marker":
+                    sent = send_data(sock, TYPE_AUDIO_SILENCE, ts, silence_marker)
+                else:
+                    sent = True
+                if not sent:
                     break  # 전송 실패 시 루프 종료
             except IOError as e:
                 logging.error(f"오디오 읽기 오류: {e}")
@@ -195,6 +213,8 @@ def audio_stream_thread(sock):
     except Exception as e:
         logging.error(f"오디오 스트리밍 스레드 오류: {e}")
     finally:
+        if vad is not None:
+            logging.info(f"오디오 VAD: {vad.stats()}")
         if audio_stream_in:
             try:
                 audio_stream_in.stop_stream()
@@ -11,6 +11,8 @@ from picamera2 import Picamera2
 from picamera2.encoders import H264Encoder
 from picamera2.outputs import FileOutput # 스트리밍 위한 커스텀 Output 필요 (이전 코드와 동일 가정)
 
+from vad import StreamingVad
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -29,8 +31,14 @@ AUDIO_DTYPE = 'int16'
 TYPE_VIDEO = 0x01
 TYPE_AUDIO = 0x02
 TYPE_PROCESSED_AUDIO = 0x03
+TYPE_AUDIO_SILENCE = 0x04 # PCM 대신 보내는 묵음 표시 (페이로드: '>H' 묵음 샘플 수)
 TYPE_CONFIG_FRAME = 0x06 # SPS/PPS 포함된 첫 프레임 데이터용 타입 추가
 
+# --- 묵음 처리 ---
+# "off" 모든 블록 PCM 전송, "marker" 묵음 블록은 TYPE_AUDIO_SILENCE로 대체, "drop" 묵음 블록은 큐에 넣지 않음
+AUDIO_VAD_MODE = "off"  # "marker"는 폰 클라이언트가 TYPE_AUDIO_SILENCE를 처리할 때만 사용
+SILENCE_MARKER = struct.pack('>H', AUDIO_BLOCKSIZE)
+
 # --- 스레드 간 통신 큐 ---
 # 큐 크기는 네트워크 상태 및 처리 속도에 따라 조절 필요
 video_queue = queue.Queue(maxsize=int(VIDEO_FRAMERATE * 1.5)) # 약 1.5초 분량 버퍼
@@ -114,6 +122,7 @@ def video_capture_thread():
 # --- 오디오 캡처 스레드 ---
 def audio_capture_thread():
     last_warning_time = 0
+    vad = StreamingVad() if AUDIO_VAD_MODE != "off" else None
     def audio_callback(indata, frames, time_info, status):
         nonlocal last_warning_time
         current_time = time.monotonic()
@@ -130,7 +139,13 @@ def audio_capture_thread():
                 logging.warning(f"Audio queue full, dropping frame. {current_time}")
                 last_warning_time = current_time
 
-        audio_data = indata.tobytes()
+        # 묵음 블록은 빈 데이터로 표시 -> send_data에서 TYPE_AUDIO_SILENCE로 보냄 (폰 쪽 향상 모델도 건너뜀)
+        if vad is None or vad.process(indata[:, 0]):
+            audio_data = indata.tobytes()
+        elif AUDIO_VAD_MODE == "marker":
+            audio_data = b''
+        else:
+            return
         audio_queue.put((audio_data, current_time), block=False) # 튜플로 저장
         # try:
         #     audio_data = indata.tobytes()
@@ -159,6 +174,8 @@ def audio_capture_thread():
     except Exception as e:
         logging.error(f"Audio capture error: {e}")
     finally:
+        if vad is not None:
+            logging.info(f"Audio VAD: {vad.stats()}")
         logging.info("Audio capture stopped.")
 
 # --- 처리된 오디오 재생 스레드 ---
@@ -274,9 +291,12 @@ async def send_data(websocket):
                 # 큐에서 데이터 가져오기 (non-blocking)
                 # data = data_q.get_nowait()
                 data, timestamp = data_q.get_nowait() # 튜플 언패킹
+                send_type = data_type
+                if data_type == TYPE_AUDIO and not data: # 묵음 블록
+                    send_type, data = TYPE_AUDIO_SILENCE, SILENCE_MARKER
                 # 메시지 헤더 생성: [Type(1)][Timestamp(8)][Length(4)]
                 # 'd'는 double(8바이트), '>'는 big-endian
-                header = struct.pack('>BdI', data_type, timestamp, len(data))
+                header = struct.pack('>BdI', send_type, timestamp, len(data))
 
                 # 데이터 전송
                 await websocket.send(header + data)
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+# 윈도우 기본 설정 (1초 윈도우 = ROI 25프레임 + 오디오 16000샘플)
+SAMPLE_RATE = 16000
+FPS = 25
+WINDOW_FRAMES = 25
+HOP_FRAMES = 5  # 다음 윈도우까지 건너뛰는 ROI 프레임 수 (0.2초)
+ROI_SHAPE = (112, 112)
+BUFFER_SECONDS = 4.0  # 링 버퍼 길이 (이보다 오래 소비되지 않으면 덮어쓰고 drop으로 집계)
+
+
+class AVWindower:
+    """
+    캡처 시각이 찍힌 오디오 블록과 입술 ROI 프레임을 미리 할당한 링 버퍼에 쌓고,
+    ROI 프레임 시각을 기준으로 같은 구간의 오디오를 잘라 정렬된 윈도우를 만든다.
+    오디오는 콜백 스레드, ROI는 캡처 루프에서 넣으므로 내부는 잠금으로 보호한다.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, fps=FPS, window_frames=WINDOW_FRAMES, hop_frames=HOP_FRAMES,
+                 roi_shape=ROI_SHAPE, buffer_seconds=BUFFER_SECONDS):
+        self.sample_rate = sample_rate
+        self.fps = fps
+        self.window_frames = window_frames
+        self.hop_frames = hop_frames
+        self.window_samples = int(round(window_frames / fps * sample_rate))
+        self.lock = threading.Lock()
+
+        # 오디오 링 버퍼: 절대 샘플 번호 n은 audio[n % 길이]에 저장
+        self.audio = np.zeros(int(buffer_seconds * sample_rate), dtype=np.float32)
+        self.audio_written = 0  # 지금까지 들어온 전체 샘플 수
+        self.audio_t0 = None  # 샘플 0의 캡처 시각
+
+        # ROI 링 버퍼: 절대 프레임 번호 i는 rois[i % 길이]에 저장
+        roi_capacity = int(buffer_seconds * fps)
+        self.rois = np.zeros((roi_capacity,) + tuple(roi_shape), dtype=np.uint8)
+        self.roi_times = np.zeros(roi_capacity, dtype=np.float64)
+        self.rois_written = 0
+        self.next_window = 0  # 다음 윈도우가 시작하는 ROI 프레임 번호
+
+        # 통계
+        self.audio_drift = 0.0  # 오디오 블록 캡처 시각 - 샘플 수로 계산한 예상 시각 (초)
+        self.audio_dropped = 0  # 윈도우로 나가기 전에 덮어쓴 오디오 샘플 수
+        self.rois_dropped = 0  # 윈도우로 나가기 전에 덮어쓴 ROI 프레임 수
+        self.frame_gaps = 0  # 캡처 간격이 1.5 프레임 이상 벌어진 횟수 (카메라 쪽 drop)
+        self.windows_emitted = 0
+        self.windows_dropped = 0  # 오디오가 이미 덮어써졌거나 앞서 시작해서 만들 수 없던 윈도우
+
+    def push_audio(self, samples, capture_time):
+        """오디오 블록 추가. capture_time은 블록 첫 샘플의 캡처 시각 (ROI와 같은 시계)"""
+        n = len(samples)
+        with self.lock:
+            if self.audio_t0 is None:
+                self.audio_t0 = capture_time
+            # 샘플 수로 계산한 시각과 실제 캡처 시각의 차이 = 오디오 클럭 드리프트
+            self.audio_drift = capture_time - (self.audio_t0 + self.audio_written / self.sample_rate)
+
+            capacity = len(self.audio)
+            start = self.audio_written % capacity
+            first = min(n, capacity - start)
+            self.audio[start:start + first] = samples[:first]
+            self.audio[:n - first] = samples[first:]
+            self.audio_written += n
+
+    def push_roi(self, roi, capture_time):
+        """ROI 프레임 추가. roi는 링 버퍼로 복사되므로 호출한 쪽에서 버퍼를 재사용해도 된다"""
+        with self.lock:
+            capacity = len(self.rois)
+            if self.rois_written > 0:
+                last_time = self.roi_times[(self.rois_written - 1) % capacity]
+                if capture_time - last_time > 1.5 / self.fps:
+                    self.frame_gaps += 1
+            # 아직 윈도우로 나가지 않은 가장 오래된 프레임을 덮어쓰게 되면 윈도우 시작을 앞으로 당김
+            if self.rois_written - self.next_window >= capacity:
+                self.next_window += self.hop_frames
+                self.rois_dropped += self.hop_frames
+            index = self.rois_written % capacity
+            self.rois[index] = roi
+            self.roi_times[index] = capture_time
+            self.rois_written += 1
+
+    def pop_windows(self):
+        """
+        만들 수 있는 윈도우를 모두 꺼낸다.
+        반환: [(시작 시각, ROI (window_frames, H, W) uint8, 오디오 (window_samples,) float32)]
+        """
+        windows = []
+        with self.lock:
+            if self.audio_t0 is None:
+                return windows
+            capacity = len(self.rois)
+            audio_capacity = len(self.audio)
+            while self.rois_written - self.next_window >= self.window_frames:
+                start_time = self.roi_times[self.next_window % capacity]
+                audio_start = int(round((start_time - self.audio_t0) * self.sample_rate))
+                audio_end = audio_start + self.window_samples
+                if audio_end > self.audio_written:
+                    break  # 오디오가 아직 도착하지 않음
+
+                if audio_start < 0 or audio_start < self.audio_written - audio_capacity:
+                    # 오디오 시작 전 구간이거나 이미 덮어쓴 구간
+                    self.windows_dropped += 1
+                    if audio_start >= 0:
+                        self.audio_dropped += min(self.window_samples, self.audio_written - audio_capacity - audio_start)
+                else:
+                    frames = np.arange(self.next_window, self.next_window + self.window_frames) % capacity
+                    samples = np.arange(audio_start, audio_end) % audio_capacity
+                    windows.append((start_time, self.rois[frames], self.audio[samples]))
+                    self.windows_emitted += 1
+                self.next_window += self.hop_frames
+        return windows
+
+    def stats(self):
+        with self.lock:
+            av_skew = 0.0
+            if self.audio_t0 is not None and self.rois_written:
+                # 마지막 오디오 샘플 시각 - 마지막 ROI 프레임 시각 (양수면 오디오가 앞서 있음)
+                audio_end_time = self.audio_t0 + self.audio_written / self.sample_rate
+                av_skew = audio_end_time - self.roi_times[(self.rois_written - 1) % len(self.rois)]
+            return {
+                "audio_drift_ms": round(self.audio_drift * 1000, 2),
+                "av_skew_ms": round(float(av_skew) * 1000, 2),
+                "audio_dropped": self.audio_dropped,
+                "rois_dropped": self.rois_dropped,
+                "frame_gaps": self.frame_gaps,
+                "windows_emitted": self.windows_emitted,
+                "windows_dropped": self.windows_dropped,
+            }
@@ -0,0 +1,114 @@
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from client import FaceMeshDetector
+
+# 라이브 클라이언트와 같은 캡처 크기로 맞춤
+FRAME_WIDTH = 540
+FRAME_HEIGHT = 360
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return {}
+    values = np.asarray(values_ms)
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p90": round(float(np.percentile(values, 90)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def replay(video_path, width=FRAME_WIDTH, height=FRAME_HEIGHT, max_frames=None, max_num_faces=5):
+    """녹화된 영상을 화면 출력 없이 findMouthROI에 통과시키며 프레임별 지표를 모은다"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    detector = FaceMeshDetector(max_num_faces=max_num_faces)
+
+    latencies, detect_latencies, reuse_latencies = [], [], []
+    centers = []
+    frames = 0
+    frames_with_roi = 0
+    frame = None
+
+    wall_start = time.perf_counter()
+    while cap.isOpened() and (max_frames is None or frames < max_frames):
+        ret, raw = cap.read()
+        if not ret:
+            break
+        if raw.shape[1] != width or raw.shape[0] != height:
+            frame = cv2.resize(raw, (width, height), dst=frame, interpolation=cv2.INTER_AREA)
+        else:
+            frame = raw
+
+        detections_before = detector.detections
+        start = time.perf_counter()
+        roi = detector.findMouthROI(frame)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        frames += 1
+
+        latencies.append(elapsed_ms)
+        if detector.detections > detections_before:
+            detect_latencies.append(elapsed_ms)
+        else:
+            reuse_latencies.append(elapsed_ms)
+
+        if roi is not None and detector.last_range is not None:
+            frames_with_roi += 1
+            x1, y1, x2, y2 = detector.last_range
+            centers.append(((x1 + x2) / 2, (y1 + y2) / 2))
+    wall_time = time.perf_counter() - wall_start
+    cap.release()
+
+    # ROI 안정성: 연속 프레임 사이 ROI 중심 이동량 (px)
+    if len(centers) > 1:
+        steps = np.linalg.norm(np.diff(np.asarray(centers), axis=0), axis=1)
+        stability = {
+            "mean_step_px": round(float(steps.mean()), 3),
+            "p90_step_px": round(float(np.percentile(steps, 90)), 3),
+            "max_step_px": round(float(steps.max()), 3),
+            "center_std_px": [round(float(v), 3) for v in np.asarray(centers).std(axis=0)],
+        }
+    else:
+        stability = {}
+
+    video_seconds = frames / fps
+    return {
+        "video": video_path,
+        "frame_size": [width, height],
+        "frames": frames,
+        "video_fps": fps,
+        "wall_time_s": round(wall_time, 3),
+        "processing_fps": round(frames / wall_time, 2) if wall_time else 0.0,
+        "latency_ms": percentiles(latencies),
+        "detect_latency_ms": percentiles(detect_latencies),
+        "reuse_latency_ms": percentiles(reuse_latencies),
+        "detections": detector.detections,
+        "detections_per_video_second": round(detector.detections / video_seconds, 3) if frames else 0.0,
+        "detections_per_wall_second": round(detector.detections / wall_time, 3) if wall_time else 0.0,
+        "cache_hit_ratio": round(len(reuse_latencies) / frames, 4) if frames else 0.0,
+        "roi_coverage": round(frames_with_roi / frames, 4) if frames else 0.0,
+        "roi_stability": stability,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="녹화 영상으로 FaceMeshDetector 성능 측정 (화면 출력 없음)")
+    parser.add_argument("video", help="입력 영상 파일")
+    parser.add_argument("--output", default="bench_detector.json", help="결과 JSON 경로")
+    parser.add_argument("--width", type=int, default=FRAME_WIDTH)
+    parser.add_argument("--height", type=int, default=FRAME_HEIGHT)
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--max-faces", type=int, default=5)
+    args = parser.parse_args()
+
+    result = replay(args.video, args.width, args.height, args.max_frames, args.max_faces)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -1,10 +1,19 @@
 
 
 import cv2
+import threading
+import wave
+import numpy as np
 import mediapipe as mp
-from queue import Queue
 import sounddevice as sd
 
+from av_window import FPS, HOP_FRAMES, AVWindower
+from inference import InferenceStage, OnnxModel
+from mouth_roi import MOUTH_LANDMARKS, MOUTH_HALF_SIZE, MouthTracker, crop_gray, mouth_range
+
+DETECT_SCALE = 0.5  # Face Mesh는 축소한 프레임에서 실행 (좌표는 정규화되어 있어 원본 크기로 바로 환산)
+WINDOW_STATS_INTERVAL = 25  # 이 윈도우 수마다 드리프트/드롭 통계 출력
+
 
 class FaceMeshDetector:
     def __init__(self, static_image_mode=False, max_num_faces=5, min_detection_con=0.5, min_tracking_con=0.5):
@@ -17,105 +26,145 @@ class FaceMeshDetector:
         )
 
         self.count = 0
+        self.detections = 0  # 전체 Face Mesh 실행 횟수
         self.last_range = None
         self.last_crop = None
-
-        # 입술 관련 랜드마크 인덱스 (Mediapipe Face Mesh 기준)
-        self.MOUTH_LANDMARKS = [0, 267, 269, 270, 409, 306, 375, 321, 405, 314,
-                                17, 84, 181, 91, 146, 61, 185, 40, 39, 37]
+        # 재사용 버퍼: 축소 검출용 BGR/RGB 프레임과 고정 크기(112x112) 입술 ROI
+        self.small_bgr = None
+        self.small_rgb = None
+        self.roi_buffer = np.empty((2 * MOUTH_HALF_SIZE, 2 * MOUTH_HALF_SIZE), dtype=np.uint8)
+        # 프레임마다 입술 ROI를 따라가는 트래커 (신뢰도가 떨어질 때만 재검출)
+        self.tracker = MouthTracker()
+
+        self.MOUTH_LANDMARKS = MOUTH_LANDMARKS
+
+    def detectMouthRange(self, img):
+        """
+        Face Mesh를 실행해 입술 crop 범위 [x1, y1, x2, y2]를 반환 (얼굴이 없으면 None)
+        범위는 원본 해상도 기준 112x112이며 프레임 밖으로 나갈 수 있다 (crop 시 패딩).
+        """
+        h, w, _ = img.shape
+        small_size = (max(1, int(w * DETECT_SCALE)), max(1, int(h * DETECT_SCALE)))
+        if self.small_bgr is None or self.small_bgr.shape[:2] != small_size[::-1]:
+            self.small_bgr = np.empty((small_size[1], small_size[0], 3), dtype=np.uint8)
+            self.small_rgb = np.empty_like(self.small_bgr)
+        cv2.resize(img, small_size, dst=self.small_bgr, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small_bgr, cv2.COLOR_BGR2RGB, dst=self.small_rgb)
+        results = self.faceMesh.process(self.small_rgb)
+        self.detections += 1
+
+        if not results.multi_face_landmarks:
+            return None
+        return mouth_range(results.multi_face_landmarks, w, h, clip=False)
+
+    def cropMouth(self, img, mouth_range):
+        # 입술 영역을 항상 112x112 Grayscale로 roi_buffer에 씀 (프레임 밖은 가장자리 패딩)
+        # 반환값은 매 프레임 재사용되는 버퍼이므로 보관하려면 copy() 필요
+        x1, y1, _, _ = mouth_range
+        self.last_crop = crop_gray(img, x1, y1, self.roi_buffer)
+        return self.last_crop
 
     def findMouthROI(self, img):
         # img = cv2.resize(img, (640, 480))
-        h, w, _ = img.shape
-
         self.count += 1
-        if self.last_range is not None and self.count % 8 != 0:
-            x1, y1, x2, y2 = self.last_range
-            self.last_crop = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
-            return self.last_crop
-
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        results = self.faceMesh.process(imgRGB)
-
-        if results.multi_face_landmarks:
-            # (a) 화면의 중앙점
-            center_x, center_y = w // 2, h // 2
-            min_dist = 9999999.0
-            best_face = None
-
-            # (b) 여러 얼굴 중 '화면 중심'과 가장 가까운 얼굴 찾기
-            for faceLms in results.multi_face_landmarks:
-                min_x, max_x = 1.0, 0.0
-                min_y, max_y = 1.0, 0.0
-
-                # 이 얼굴 전체 landmark의 min/max
-                for lm in faceLms.landmark:
-                    if lm.x < min_x: min_x = lm.x
-                    if lm.x > max_x: max_x = lm.x
-                    if lm.y < min_y: min_y = lm.y
-                    if lm.y > max_y: max_y = lm.y
-
-                # 얼굴 바운딩박스의 중심
-                box_center_x = int(((min_x + max_x) / 2) * w)
-                box_center_y = int(((min_y + max_y) / 2) * h)
-
-                dist = (box_center_x - center_x) * (box_center_x - center_x) + (box_center_y - center_y)*(box_center_y - center_y)
-                if dist < min_dist:
-                    min_dist = dist
-                    best_face = faceLms
-
-            # (2) best_face에서 입술 좌표만 추출 → 바운딩박스 중심 구하기
-            if best_face is not None:
-                min_x, max_x = w, 0
-                min_y, max_y = h, 0
-                for idx in self.MOUTH_LANDMARKS:
-                    px = int(best_face.landmark[idx].x * w)
-                    py = int(best_face.landmark[idx].y * h)
-
-                    if px < min_x: min_x = px
-                    if px > max_x: max_x = px
-                    if py < min_y: min_y = py
-                    if py > max_y: max_y = py
-
-                # 입술 바운딩박스 중심
-                cx = (min_x + max_x) // 2
-                cy = (min_y + max_y) // 2
-
-                # (3) 크기를 원본에서 crop
-                half_size = 56
-
-                # 좌표 범위가 이미지 밖으로 나가지 않도록 보정
-                x1 = max(0, cx - half_size)
-                y1 = max(0, cy - half_size)
-                x2 = min(w, cx + half_size)
-                y2 = min(h, cy + half_size)
-
-                # crop한 입술 영역
-                mouth_crop = img[y1:y2, x1:x2]
-
-                # Grayscale 변환
-                if mouth_crop is not None and mouth_crop.size > 0:
-                    self.last_range = [x1, y1, x2, y2]
-                    self.last_crop = cv2.cvtColor(mouth_crop, cv2.COLOR_BGR2GRAY)
+        if self.last_range is not None:
+            # 트래킹이 유지되면 Face Mesh 없이 crop
+            tracked_range = self.tracker.update(img)
+            if tracked_range is not None:
+                self.last_range = tracked_range
+                return self.cropMouth(img, tracked_range)
+
+        mouth_range = self.detectMouthRange(img)
+        if mouth_range is not None:
+            self.last_range = mouth_range
+            self.tracker.reset(img, mouth_range)
+            self.cropMouth(img, mouth_range)
 
         return self.last_crop
 
 
+class FaceMeshWorker:
+    """
+    Face Mesh를 별도 스레드에서 실행한다.
+    캡처 루프는 submit()으로 최신 프레임만 넘기고 기다리지 않으며, 워커는 항상 가장 최근 프레임을 처리해
+    latest에 (순번, 검출한 프레임, 입술 crop 범위)를 게시한다. 처리 중에 들어온 이전 프레임은 버려진다.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.condition = threading.Condition()
+        self.frame = None
+        self.latest = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+        self.submitted = 0
+        self.processed = 0
+        self.errors = 0  # 검출 중 예외가 난 프레임 수 (그 프레임은 건너뛰고 이전 ROI를 유지)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify()
+        self.thread.join()
+
+    def submit(self, frame):
+        # 이전 프레임이 아직 처리되지 않았으면 덮어씀 (latest-wins)
+        with self.condition:
+            self.frame = frame
+            self.submitted += 1
+            self.condition.notify()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with self.condition:
+                self.condition.wait_for(lambda: self.frame is not None or self.stop_event.is_set())
+                frame, self.frame = self.frame, None
+            if frame is None:
+                continue
+
+            try:
+                mouth_range = self.detector.detectMouthRange(frame)
+            except Exception as e:
+                # 한 프레임의 MediaPipe/OpenCV 오류로 스레드가 끝나면 ROI가 조용히 멈추므로 기록하고 계속
+                self.errors += 1
+                print(f'face mesh error ({self.errors}): {e}')
+                continue
+            self.processed += 1
+            if mouth_range is not None:
+                # 튜플 참조 교체는 원자적이므로 캡처 루프는 잠금 없이 읽는다
+                self.latest = (self.processed, frame, mouth_range)
+
+    def stats(self):
+        return {"submitted": self.submitted, "processed": self.processed, "errors": self.errors}
+
+
 class Client:
-    def __init__(self, ip, port, sample_rate=16000, block_size=3200):
+    def __init__(self, ip, port, sample_rate=16000, block_size=3200, model=None, on_result=None):
+        if model is not None and on_result is None:
+            raise ValueError("model을 쓰려면 추론 결과를 받을 on_result(start_time, output)가 필요함")
         self.ip = ip
         self.port = port
         self.sample_rate = sample_rate
         self.block_size = block_size
-        # 오디오 블록(640샘플)들을 쌓아둘 큐
-        self.audio_queue = Queue()
+        # 오디오 블록과 ROI 프레임을 캡처 시각 기준으로 정렬해 윈도우(ROI 25프레임 + 16000샘플)로 묶음
+        self.windower = AVWindower(sample_rate=sample_rate)
+        # 음성 향상 모델 (video_batch, audio_batch) -> 출력, 워커 스레드에서 마이크로 배치로 실행
+        self.inference = InferenceStage(model) if model is not None else None
+        self.on_result = on_result  # 윈도우 순서대로 (시작 시각, 모델 출력)을 받는 콜백 (캡처 루프에서 호출)
         self.roi_detector = FaceMeshDetector()
+        # 검출은 워커 스레드에서, 캡처 루프는 현재 ROI로 crop만 수행
+        self.roi_worker = FaceMeshWorker(self.roi_detector)
 
     def audio_callback(self, indata, frames, time_info, status):
         # 블록사이즈(blocksize)=640으로 설정해 두면 frames=640이 됨
-        # 받은 오디오를 큐에 넣는다. 꼭 copy() 해서 넣는 것이 안전
-        self.audio_queue.put(indata[:, 0].copy())
-        # print(f'audio queue size: {len(self.audio_queue.queue)}')
+        # 블록 첫 샘플의 ADC 시각(PortAudio 스트림 시계)을 찍어 링 버퍼로 복사
+        # 일부 백엔드는 ADC 시각을 0으로 주므로 현재 시각에서 블록 길이만큼 빼서 대신 사용
+        capture_time = time_info.inputBufferAdcTime or (time_info.currentTime - frames / self.sample_rate)
+        self.windower.push_audio(indata[:, 0], capture_time)
 
     def start(self):
         # 카메라 열기
@@ -124,38 +173,121 @@ class Client:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 540)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
 
+        tracker = MouthTracker()
+        tracked_seq = None
+        self.roi_worker.start()
+        if self.inference is not None:
+            self.inference.start()
         with sd.InputStream(
                 samplerate=self.sample_rate,
                 channels=1,
                 dtype='float32',
                 blocksize=self.block_size,
                 callback=self.audio_callback
-        ):
+        ) as stream:
             while cap.isOpened():
                 ret, frame = cap.read()
                 if not ret:
                     break
-
-                mouth_roi = self.roi_detector.findMouthROI(frame)
-
-                if self.audio_queue.qsize() > 0:
-                    input_audio = self.audio_queue.get()
-
+                # 오디오와 같은 PortAudio 스트림 시계로 프레임 캡처 시각 기록
+                frame_time = stream.time
+
+                # 새 검출 결과가 게시되었으면 그 프레임으로 트래커를 다시 초기화
+                latest = self.roi_worker.latest
+                if latest is not None and latest[0] != tracked_seq:
+                    tracked_seq, detected_frame, detected_range = latest
+                    tracker.reset(detected_frame, detected_range)
+
+                # 트래킹에 실패했을 때만 워커에 재검출을 요청하고, 결과를 기다리지 않고 마지막 ROI로 crop
+                mouth_range = tracker.update(frame)
+                if mouth_range is None:
+                    self.roi_worker.submit(frame)
+                    mouth_range = tracker.range
+                mouth_roi = self.roi_detector.cropMouth(frame, mouth_range) if mouth_range is not None else None
+
+                if mouth_roi is not None:
+                    self.windower.push_roi(mouth_roi, frame_time)
+                    cv2.imshow("Mouth ROI", mouth_roi)
+                else:
+                    cv2.imshow("Mouth ROI", frame)
+
+                for start_time, roi_window, audio_window in self.windower.pop_windows():
                     # print('extracted audio and video #')
+                    input_video = roi_window[None]  # 배치로 묶이면 (B, 1, 25, 112, 112)
+                    input_audio = audio_window  # 배치로 묶이면 (B, 16000)
+                    if self.inference is not None:
+                        self.inference.submit(start_time, input_video, input_audio)
 
-                    if mouth_roi is not None:
-                        input_video = mouth_roi[None, None, None]
-                        cv2.imshow("Mouth ROI", mouth_roi)
-                    else:
-                        cv2.imshow("Mouth ROI", frame)
+                    if self.windower.windows_emitted % WINDOW_STATS_INTERVAL == 0:
+                        print('window stats:', self.windower.stats())
+                        print('face mesh stats:', self.roi_worker.stats())
+                        if self.inference is not None:
+                            print('inference stats:', self.inference.stats())
+
+                if self.inference is not None:
+                    for start_time, output in self.inference.pop_results():
+                        self.on_result(start_time, output)
 
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
+            self.roi_worker.stop()
+            if self.inference is not None:
+                self.inference.stop()
             cap.release()
             cv2.destroyAllWindows()
 
 
+class WavResultWriter:
+    """
+    모델 출력(윈도우당 오디오, -1~1 float 또는 int16)을 wav 파일에 이어 쓴다.
+    윈도우는 hop(5프레임 = 0.2초)씩 겹치므로 시작 시각을 hop 단위 위치로 맞추고 아직 쓰지 않은 뒷부분만 쓴다.
+    중간 윈도우가 버려져 비는 구간은 묵음으로 채워 파일 시간이 실제 시간과 맞게 한다.
+    """
+
+    def __init__(self, path, sample_rate=16000, fps=FPS, hop_frames=HOP_FRAMES):
+        self.wav_file = wave.open(path, 'wb')
+        self.wav_file.setnchannels(1)
+        self.wav_file.setsampwidth(2)
+        self.wav_file.setframerate(sample_rate)
+        self.sample_rate = sample_rate
+        self.hop_samples = int(round(hop_frames / fps * sample_rate))
+        self.first_start = None
+        self.written = 0  # 첫 윈도우 시작부터 지금까지 쓴 샘플 수
+
+    def __call__(self, start_time, output):
+        samples = np.asarray(output).reshape(-1)
+        if samples.dtype != np.int16:
+            samples = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+
+        if self.first_start is None:
+            self.first_start = start_time
+        # 프레임 시각의 지터는 hop 격자로 흡수
+        hops = int(round((start_time - self.first_start) * self.sample_rate / self.hop_samples))
+        offset = hops * self.hop_samples
+        if offset > self.written:
+            self.wav_file.writeframes(np.zeros(offset - self.written, np.int16).tobytes())
+            self.written = offset
+        new = samples[self.written - offset:]
+        self.wav_file.writeframes(new.tobytes())
+        self.written += len(new)
+
+    def close(self):
+        self.wav_file.close()
+
+
 if __name__ == '__main__':
-    client = Client('192.168.x.x', 5555, sample_rate=16000, block_size=640)
-    client.start()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--onnx", help="음성 향상 ONNX 모델 경로 (없으면 추론 생략)")
+    parser.add_argument("--output", default="enhanced.wav", help="모델 출력 오디오를 저장할 wav 파일")
+    args = parser.parse_args()
+
+    model = OnnxModel(args.onnx) if args.onnx else None
+    writer = WavResultWriter(args.output) if model is not None else None
+    client = Client('192.168.x.x', 5555, sample_rate=16000, block_size=640, model=model, on_result=writer)
+    try:
+        client.start()
+    finally:
+        if writer is not None:
+            writer.close()
\ No newline at end of file
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 추론 단계 기본 설정
+MAX_BATCH = 4  # 한 번에 모델에 넣는 최대 윈도우 수
+MAX_WAIT = 0.02  # 첫 윈도우가 들어온 뒤 배치를 더 모으며 기다리는 최대 시간 (초)
+LATENCY_BUDGET = 0.1  # 배치 한 번의 추론 시간 예산 (초), 넘으면 배치 크기를 줄임
+MAX_PENDING = 16  # 대기 중인 윈도우가 이보다 많으면 가장 오래된 것부터 버림
+
+
+class OnnxModel:
+    """
+    ONNX Runtime CPU 세션을 (video_batch, audio_batch) -> 출력 배치 형태의 callable로 감싼다.
+    모델 입력은 순서대로 video, audio로 가정한다.
+    """
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, video_batch, audio_batch):
+        feeds = dict(zip(self.input_names, (video_batch.astype(np.float32), audio_batch.astype(np.float32))))
+        return self.session.run(None, feeds)[0]
+
+
+class InferenceStage:
+    """
+    정렬된 오디오/ROI 윈도우를 받아 워커 스레드에서 마이크로 배치로 모델을 실행한다.
+    model은 (video_batch, audio_batch)를 받아 첫 축이 배치인 출력을 반환하는 callable이면 된다.
+    결과는 submit()한 순서대로 pop_results()에서 꺼낼 수 있다.
+    """
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait=MAX_WAIT, latency_budget=LATENCY_BUDGET,
+                 max_pending=MAX_PENDING):
+        self.model = model
+        self.max_batch = max_batch
+        self.batch_size = max_batch  # 예산에 맞춰 조절되는 현재 배치 크기
+        self.max_wait = max_wait
+        self.latency_budget = latency_budget
+        self.max_pending = max_pending
+
+        self.condition = threading.Condition()
+        self.pending = deque()  # (seq, 제출 시각, 시작 시각, video, audio)
+        self.results = {}  # seq -> (시작 시각, 출력)
+        self.next_seq = 0
+        self.next_result = 0  # 다음에 내보낼 seq (버려진 seq는 건너뜀)
+        self.dropped_seqs = set()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+        # 통계
+        self.batches = 0
+        self.items = 0
+        self.dropped = 0
+        self.errors = 0  # 모델 호출이 실패한 배치 수
+        self.failed = 0  # 실패한 배치에 들어 있던 윈도우 수
+        self.budget_overruns = 0
+        self.inference_time = 0.0
+        self.latency_total = 0.0  # submit -> 결과까지
+        self.latency_max = 0.0
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify()
+        self.thread.join()
+
+    def submit(self, start_time, video, audio):
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                seq = self.pending.popleft()[0]
+                self.dropped_seqs.add(seq)
+                self.dropped += 1
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending.append((seq, time.monotonic(), start_time, video, audio))
+            self.condition.notify()
+        return seq
+
+    def next_batch(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending or self.stop_event.is_set())
+            if not self.pending:
+                return []
+            # 첫 윈도우 기준 max_wait까지만 배치를 더 모음
+            deadline = self.pending[0][1] + self.max_wait
+            while len(self.pending) < self.batch_size and not self.stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            count = min(self.batch_size, len(self.pending))
+            return [self.pending.popleft() for _ in range(count)]
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = self.next_batch()
+            if not batch:
+                continue
+
+            start = time.monotonic()
+            try:
+                video_batch = np.stack([item[3] for item in batch])
+                audio_batch = np.stack([item[4] for item in batch])
+                outputs = self.model(video_batch, audio_batch)
+                if len(outputs) != len(batch):
+                    raise ValueError(f"출력 배치 크기 {len(outputs)} != 입력 {len(batch)}")
+            except Exception as e:
+                # 이 배치의 seq를 버린 것으로 처리해야 pop_results()가 뒤의 결과를 계속 내보냄
+                print(f'inference error (batch of {len(batch)} dropped): {e}')
+                with self.condition:
+                    self.dropped_seqs.update(item[0] for item in batch)
+                    self.errors += 1
+                    self.failed += len(batch)
+                continue
+            end = time.monotonic()
+            elapsed = end - start
+
+            # 예산을 넘으면 배치를 줄이고, 여유가 많으면 다시 키움
+            if elapsed > self.latency_budget:
+                self.budget_overruns += 1
+                self.batch_size = max(1, self.batch_size - 1)
+            elif elapsed < self.latency_budget / 2:
+                self.batch_size = min(self.max_batch, self.batch_size + 1)
+
+            with self.condition:
+                for item, output in zip(batch, outputs):
+                    seq, submitted_at, start_time = item[:3]
+                    self.results[seq] = (start_time, output)
+                    latency = end - submitted_at
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                self.batches += 1
+                self.items += len(batch)
+                self.inference_time += elapsed
+
+    def pop_results(self):
+        """준비된 결과를 submit 순서대로 꺼낸다: [(시작 시각, 출력)]"""
+        results = []
+        with self.condition:
+            while self.next_result < self.next_seq:
+                seq = self.next_result
+                if seq in self.dropped_seqs:
+                    self.dropped_seqs.discard(seq)
+                elif seq in self.results:
+                    results.append(self.results.pop(seq))
+                else:
+                    break  # 아직 추론 중
+                self.next_result += 1
+        return results
+
+    def stats(self):
+        with self.condition:
+            elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "failed": self.failed,
+                "batch_size": self.batch_size,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "inference_ms_per_batch": round(self.inference_time / self.batches * 1000, 2) if self.batches else 0.0,
+                "latency_ms_avg": round(self.latency_total / self.items * 1000, 2) if self.items else 0.0,
+                "latency_ms_max": round(self.latency_max * 1000, 2),
+                "budget_overruns": self.budget_overruns,
+                "throughput_per_s": round(self.items / elapsed, 2) if elapsed else 0.0,
+            }
@@ -0,0 +1,169 @@
+import cv2
+import numpy as np
+
+# 입술 관련 랜드마크 인덱스 (Mediapipe Face Mesh 기준)
+MOUTH_LANDMARKS = [0, 267, 269, 270, 409, 306, 375, 321, 405, 314,
+                   17, 84, 181, 91, 146, 61, 185, 40, 39, 37]
+MOUTH_HALF_SIZE = 56  # 입술 crop 크기의 절반 (112x112)
+
+# 트래커 설정
+TRACK_SEARCH_MARGIN = 16  # 직전 ROI 주변 탐색 범위 (px)
+TRACK_MIN_SCORE = 0.7  # 템플릿 매칭 점수(TM_CCOEFF_NORMED)가 이보다 낮으면 재검출
+TRACK_MAX_DRIFT = 40  # 검출 위치에서 이만큼 이상 이동하면 재검출 (px, L1 거리)
+REDETECT_INTERVAL = 50  # 트래킹이 잘 되어도 이 프레임 수마다 재검출 (25fps 기준 2초)
+
+
+def mouth_range(multi_face_landmarks, w, h, half_size=MOUTH_HALF_SIZE, clip=True):
+    """
+    Mediapipe 결과에서 화면 중심에 가장 가까운 얼굴을 고르고 입술 중심 기준 crop 범위 [x1, y1, x2, y2]를 반환
+    clip=False면 프레임 밖으로 나가도 항상 (2 * half_size) 정사각형 범위를 반환한다.
+    랜드마크는 정규화 좌표이므로 축소한 프레임에서 검출해도 w, h에 원본 크기를 넘기면 된다.
+    """
+    # (a) 화면의 중앙점
+    center_x, center_y = w // 2, h // 2
+    min_dist = 9999999.0
+    best_face = None
+
+    # (b) 여러 얼굴 중 '화면 중심'과 가장 가까운 얼굴 찾기
+    for faceLms in multi_face_landmarks:
+        min_x, max_x = 1.0, 0.0
+        min_y, max_y = 1.0, 0.0
+
+        # 이 얼굴 전체 landmark의 min/max
+        for lm in faceLms.landmark:
+            if lm.x < min_x: min_x = lm.x
+            if lm.x > max_x: max_x = lm.x
+            if lm.y < min_y: min_y = lm.y
+            if lm.y > max_y: max_y = lm.y
+
+        # 얼굴 바운딩박스의 중심
+        box_center_x = int(((min_x + max_x) / 2) * w)
+        box_center_y = int(((min_y + max_y) / 2) * h)
+
+        dist = (box_center_x - center_x) * (box_center_x - center_x) + (box_center_y - center_y)*(box_center_y - center_y)
+        if dist < min_dist:
+            min_dist = dist
+            best_face = faceLms
+
+    # (c) best_face에서 입술 좌표만 추출 → 바운딩박스 중심 구하기
+    min_x, max_x = w, 0
+    min_y, max_y = h, 0
+    for idx in MOUTH_LANDMARKS:
+        px = int(best_face.landmark[idx].x * w)
+        py = int(best_face.landmark[idx].y * h)
+
+        if px < min_x: min_x = px
+        if px > max_x: max_x = px
+        if py < min_y: min_y = py
+        if py > max_y: max_y = py
+
+    # 입술 바운딩박스 중심
+    cx = (min_x + max_x) // 2
+    cy = (min_y + max_y) // 2
+
+    if not clip:
+        return [cx - half_size, cy - half_size, cx + half_size, cy + half_size]
+
+    # (d) 좌표 범위가 이미지 밖으로 나가지 않도록 보정
+    x1 = max(0, cx - half_size)
+    y1 = max(0, cy - half_size)
+    x2 = min(w, cx + half_size)
+    y2 = min(h, cy + half_size)
+    return [x1, y1, x2, y2]
+
+
+def crop_gray(img, x1, y1, out):
+    """
+    BGR 이미지의 (x1, y1)부터 out 크기만큼을 그레이스케일로 변환해 out에 바로 쓴다 (새 배열 할당 없음).
+    프레임 밖으로 나간 부분은 가장자리 픽셀을 복제해서 채우므로 항상 out.shape 그대로 나온다.
+    """
+    h, w = img.shape[:2]
+    oh, ow = out.shape
+    # 최소 한 픽셀은 프레임과 겹치도록 보정
+    x1 = min(max(x1, 1 - ow), w - 1)
+    y1 = min(max(y1, 1 - oh), h - 1)
+
+    sx1, sy1 = max(x1, 0), max(y1, 0)
+    sx2, sy2 = min(x1 + ow, w), min(y1 + oh, h)
+    ox1, oy1 = sx1 - x1, sy1 - y1
+    ox2, oy2 = ox1 + (sx2 - sx1), oy1 + (sy2 - sy1)
+    cv2.cvtColor(img[sy1:sy2, sx1:sx2], cv2.COLOR_BGR2GRAY, dst=out[oy1:oy2, ox1:ox2])
+
+    # 가장자리 복제 패딩
+    if oy1 > 0:
+        out[:oy1, ox1:ox2] = out[oy1, ox1:ox2]
+    if oy2 < oh:
+        out[oy2:, ox1:ox2] = out[oy2 - 1, ox1:ox2]
+    if ox1 > 0:
+        out[:, :ox1] = out[:, ox1:ox1 + 1]
+    if ox2 < ow:
+        out[:, ox2:] = out[:, ox2 - 1:ox2]
+    return out
+
+
+class MouthTracker:
+    """
+    검출된 입술 ROI를 템플릿 매칭으로 프레임마다 따라간다.
+    매칭 점수가 낮거나, 검출 위치에서 너무 멀어졌거나, 검출 후 오래 지나면 update()가 None을 반환해
+    전체 Face Mesh 재검출이 필요하다는 것을 알린다.
+    """
+
+    def __init__(self, search_margin=TRACK_SEARCH_MARGIN, min_score=TRACK_MIN_SCORE,
+                 max_drift=TRACK_MAX_DRIFT, max_interval=REDETECT_INTERVAL):
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.max_drift = max_drift
+        self.max_interval = max_interval
+
+        # 템플릿/탐색 창/매칭 결과는 ROI 크기가 바뀔 때만 새로 할당
+        self.template = None
+        self.window = None
+        self.result = None
+        self.range = None
+        self.origin = None
+        self.frames_since_detection = 0
+        self.score = 0.0
+
+    def reset(self, img, mouth_range):
+        # 검출이 실행된 프레임에서 템플릿을 잘라 둔다 (프레임 밖은 가장자리 패딩)
+        x1, y1, x2, y2 = mouth_range
+        size = (y2 - y1, x2 - x1)
+        if self.template is None or self.template.shape != size:
+            margin = 2 * self.search_margin
+            self.template = np.empty(size, dtype=np.uint8)
+            self.window = np.empty((size[0] + margin, size[1] + margin), dtype=np.uint8)
+            self.result = np.empty((margin + 1, margin + 1), dtype=np.float32)
+        crop_gray(img, x1, y1, self.template)
+        self.range = list(mouth_range)
+        self.origin = (x1, y1)
+        self.frames_since_detection = 0
+        self.score = 1.0
+
+    def update(self, img):
+        if self.template is None:
+            return None
+        self.frames_since_detection += 1
+        if self.frames_since_detection >= self.max_interval:
+            return None
+
+        # 직전 ROI 주변 search_margin 만큼만 그레이스케일로 변환해서 매칭
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = self.range
+        if x2 <= 0 or y2 <= 0 or x1 >= w or y1 >= h:
+            return None
+        th, tw = self.template.shape
+        wx1 = x1 - self.search_margin
+        wy1 = y1 - self.search_margin
+
+        crop_gray(img, wx1, wy1, self.window)
+        cv2.matchTemplate(self.window, self.template, cv2.TM_CCOEFF_NORMED, result=self.result)
+        _, self.score, _, (dx, dy) = cv2.minMaxLoc(self.result)
+        if self.score < self.min_score:
+            return None
+
+        nx1, ny1 = wx1 + dx, wy1 + dy
+        if abs(nx1 - self.origin[0]) + abs(ny1 - self.origin[1]) > self.max_drift:
+            return None
+
+        self.range = [nx1, ny1, nx1 + tw, ny1 + th]
+        return self.range
@@ -0,0 +1,227 @@
+# 같은 파일이 aiortc_0, aiortc_1, withpipe2에 복사되어 있음: 예제 디렉터리마다 그 안에서 스크립트를 따로 실행하므로
+# 공용 패키지 대신 복사본을 둔다. 고칠 때는 모든 복사본을 똑같이 고칠 것
+import logging
+import multiprocessing
+from fractions import Fraction
+
+import aiortc.rtcrtpsender
+import av
+from aiortc import RTCRtpSender
+from aiortc.codecs import h264, vpx
+from aiortc.codecs.h264 import H264Encoder
+from aiortc.codecs.vpx import Vp8Encoder
+
+logger = logging.getLogger(__name__)
+
+# 인코더 기본 설정 (None/0이면 aiortc 기본값 그대로)
+VIDEO_CODEC = "VP8"  # 협상에서 먼저 제안할 코덱: "VP8" 또는 "H264" (상대가 지원하지 않으면 나머지 코덱으로)
+H264_BACKEND = "libx264"  # "libx264" 또는 "h264_v4l2m2m" (라즈베리파이 하드웨어 인코더, 열리지 않으면 libx264)
+START_BITRATE = None  # 시작 목표 비트레이트 (bps), None이면 VP8 500k / H.264 1M
+MIN_BITRATE = None  # REMB로 내려갈 수 있는 하한 (bps), None이면 VP8 250k / H.264 500k
+MAX_BITRATE = None  # REMB로 올라갈 수 있는 상한 (bps), None이면 VP8 1.5M / H.264 3M
+GOP = None  # 키프레임 간격 (프레임), None이면 VP8 3000 / x264 250 (PLI/FIR가 오면 그때도 키프레임)
+X264_PRESET = "medium"  # libx264 preset (ultrafast ~ veryslow), 느릴수록 같은 비트레이트에서 화질이 좋고 CPU를 더 씀
+VPX_CPU_USED = -6  # libvpx realtime 속도 (-16 ~ 16, 절댓값이 클수록 빠르고 화질이 낮음)
+FRAME_RATE = None  # 보내는 fps, x264 레이트 컨트롤이 프레임당 예산을 이것으로 나눔 (None이면 aiortc처럼 30)
+ENCODER_THREADS = 0  # 인코더 스레드 수, 0이면 자동 (VP8은 해상도/코어 수로, x264는 코어 수로)
+VPX_DEFAULT_GOP = 3000  # aiortc Vp8Encoder의 kf_max_dist
+
+
+def needs_codec(codec, frame, bitrate):
+    # aiortc 인코더와 같은 조건: 크기가 바뀌거나 목표 비트레이트가 10% 넘게 바뀌면 코덱을 다시 엶
+    return (
+        codec is None
+        or frame.width != codec.width
+        or frame.height != codec.height
+        or abs(bitrate - codec.bit_rate) / codec.bit_rate > 0.1
+    )
+
+
+class EncoderConfig:
+    """
+    aiortc 비디오 인코더 설정: 코덱 선호 순서, 비트레이트 범위, GOP, x264 preset/libvpx 속도, 스레드 수, H.264 백엔드.
+    install()하면 RTCRtpSender가 만드는 VP8/H.264 인코더가 이 설정을 쓰고, apply(transceiver)로 트랜시버마다
+    선호 코덱을 앞에 둔다 (오퍼를 만들거나 setRemoteDescription 하기 전에 호출해야 협상에 반영됨).
+    """
+
+    def __init__(self, codec=VIDEO_CODEC, h264_backend=H264_BACKEND, start_bitrate=START_BITRATE,
+                 min_bitrate=MIN_BITRATE, max_bitrate=MAX_BITRATE, gop=GOP, preset=X264_PRESET,
+                 cpu_used=VPX_CPU_USED, frame_rate=FRAME_RATE, threads=ENCODER_THREADS):
+        self.codec = codec
+        self.h264_backend = h264_backend
+        self.start_bitrate = start_bitrate
+        self.min_bitrate = min_bitrate
+        self.max_bitrate = max_bitrate
+        self.gop = gop
+        self.preset = preset
+        self.cpu_used = cpu_used
+        self.frame_rate = frame_rate
+        self.threads = threads
+
+    def __repr__(self):
+        return (f"EncoderConfig(codec={self.codec}, h264_backend={self.h264_backend}, "
+                f"bitrate={self.start_bitrate}/{self.min_bitrate}-{self.max_bitrate}, gop={self.gop}, "
+                f"preset={self.preset}, cpu_used={self.cpu_used}, frame_rate={self.frame_rate}, "
+                f"threads={self.threads})")
+
+    def bitrate_bounds(self, module):
+        """(시작, 하한, 상한) 비트레이트, 지정하지 않은 값은 aiortc 코덱 모듈(vpx/h264)의 기본값"""
+        low = self.min_bitrate or module.MIN_BITRATE
+        high = max(self.max_bitrate or module.MAX_BITRATE, low)
+        start = self.start_bitrate or module.DEFAULT_BITRATE
+        return max(low, min(start, high)), low, high
+
+    def codec_preferences(self, kind="video"):
+        # 선호 코덱을 앞으로 옮기기만 하고 나머지(rtx 포함)는 남겨서 상대가 지원하지 않아도 협상이 되게 함
+        preferred = f"{kind}/{self.codec}".lower()
+        codecs = RTCRtpSender.getCapabilities(kind).codecs
+        return sorted(codecs, key=lambda c: c.mimeType.lower() != preferred)
+
+    def apply(self, transceiver):
+        if transceiver.kind == "video":
+            transceiver.setCodecPreferences(self.codec_preferences(transceiver.kind))
+        return transceiver
+
+    def create_encoder(self, codec):
+        mime_type = codec.mimeType.lower()
+        if mime_type == "video/vp8":
+            return ConfiguredVp8Encoder(self)
+        if mime_type == "video/h264":
+            return ConfiguredH264Encoder(self)
+        return None
+
+    def install(self):
+        """RTCRtpSender가 인코더를 만들 때 이 설정을 쓰도록 한다 (다른 코덱은 aiortc 기본 인코더)"""
+        get_encoder = aiortc.rtcrtpsender.get_encoder
+
+        def configured_get_encoder(codec):
+            return self.create_encoder(codec) or get_encoder(codec)
+
+        aiortc.rtcrtpsender.get_encoder = configured_get_encoder
+        logger.info(f"인코더 설정: {self}")
+        return self
+
+    def open_vp8(self, frame, bitrate):
+        codec = av.CodecContext.create("libvpx", "w")
+        codec.width = frame.width
+        codec.height = frame.height
+        codec.bit_rate = bitrate
+        codec.pix_fmt = "yuv420p"
+        codec.gop_size = self.gop or VPX_DEFAULT_GOP  # kf_max_dist
+        codec.qmin = 2  # rc_min_quantizer
+        codec.qmax = 56  # rc_max_quantizer
+        # cpu-used/GOP/스레드 외에는 aiortc Vp8Encoder와 같은 realtime CBR 설정
+        codec.options = {
+            "bufsize": str(bitrate),  # rc_buf_sz = 1000ms
+            "cpu-used": str(self.cpu_used),
+            "deadline": "realtime",
+            "lag-in-frames": "0",
+            "minrate": str(bitrate),
+            "maxrate": str(bitrate),
+            "noise-sensitivity": "4",
+            "overshoot-pct": "15",
+            "partitions": "0",
+            "static-thresh": "1",
+            "undershoot-pct": "100",
+        }
+        codec.thread_count = self.threads or vpx.number_of_threads(
+            frame.width * frame.height, multiprocessing.cpu_count()
+        )
+        return codec
+
+    def open_h264(self, frame, bitrate):
+        if self.h264_backend != "libx264":
+            try:
+                codec = self.create_h264(self.h264_backend, frame, bitrate)
+                codec.open()
+                return codec
+            except Exception as e:
+                logger.warning(f"{self.h264_backend}를 열 수 없어 libx264 사용: {e}")
+                self.h264_backend = "libx264"
+        return self.create_h264("libx264", frame, bitrate)
+
+    def create_h264(self, backend, frame, bitrate):
+        codec = av.CodecContext.create(backend, "w")
+        codec.width = frame.width
+        codec.height = frame.height
+        codec.bit_rate = bitrate
+        codec.pix_fmt = "yuv420p"
+        # 실제 fps보다 높게 잡으면 프레임당 예산이 줄어 목표 비트레이트보다 적게 나옴 (10fps에 30이면 1/3)
+        frame_rate = self.frame_rate or h264.MAX_FRAME_RATE
+        codec.framerate = Fraction(frame_rate, 1)
+        codec.time_base = Fraction(1, frame_rate)
+        if self.gop:
+            codec.gop_size = self.gop
+        if backend == "libx264":
+            codec.options = {"level": "31", "preset": self.preset, "tune": "zerolatency"}
+            codec.profile = "Baseline"
+            if self.threads:
+                codec.thread_count = self.threads
+        return codec
+
+
+class BoundedBitrate:
+    # REMB로 들어오는 목표 비트레이트를 aiortc 상수 대신 설정의 범위로 자름
+    module = None
+
+    @property
+    def target_bitrate(self):
+        return self.bitrate
+
+    @target_bitrate.setter
+    def target_bitrate(self, bitrate):
+        _, low, high = self.config.bitrate_bounds(self.module)
+        self.bitrate = max(low, min(bitrate, high))
+
+
+class ConfiguredVp8Encoder(BoundedBitrate, Vp8Encoder):
+    module = vpx
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.bitrate = config.bitrate_bounds(vpx)[0]
+
+    def encode(self, frame, force_keyframe=False):
+        # 코덱을 여기서 설정대로 먼저 열어 두면 Vp8Encoder.encode는 그대로 재사용함
+        if needs_codec(self.codec, frame, self.target_bitrate):
+            self.codec = self.config.open_vp8(frame, self.target_bitrate)
+        return super().encode(frame, force_keyframe)
+
+
+class ConfiguredH264Encoder(BoundedBitrate, H264Encoder):
+    module = h264
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.bitrate = config.bitrate_bounds(h264)[0]
+
+    def _encode_frame(self, frame, force_keyframe):
+        if needs_codec(self.codec, frame, self.target_bitrate):
+            self.buffer_data = b""
+            self.buffer_pts = None
+            self.codec = self.config.open_h264(frame, self.target_bitrate)
+        return super()._encode_frame(frame, force_keyframe)
+
+
+def add_encoder_arguments(parser):
+    group = parser.add_argument_group("인코더")
+    group.add_argument("--codec", default=VIDEO_CODEC, choices=["VP8", "H264"], help="먼저 제안할 비디오 코덱")
+    group.add_argument("--h264-backend", default=H264_BACKEND, choices=["libx264", "h264_v4l2m2m"])
+    group.add_argument("--bitrate", type=int, default=START_BITRATE, help="시작 목표 비트레이트 (bps)")
+    group.add_argument("--min-bitrate", type=int, default=MIN_BITRATE, help="목표 비트레이트 하한 (bps)")
+    group.add_argument("--max-bitrate", type=int, default=MAX_BITRATE, help="목표 비트레이트 상한 (bps)")
+    group.add_argument("--gop", type=int, default=GOP, help="키프레임 간격 (프레임)")
+    group.add_argument("--preset", default=X264_PRESET, help="libx264 preset")
+    group.add_argument("--cpu-used", type=int, default=VPX_CPU_USED, help="libvpx cpu-used (-16 ~ 16)")
+    group.add_argument("--frame-rate", type=int, default=FRAME_RATE, help="x264 레이트 컨트롤 기준 fps")
+    group.add_argument("--encoder-threads", type=int, default=ENCODER_THREADS, help="인코더 스레드 수 (0: 자동)")
+    return group
+
+
+def config_from_args(args):
+    return EncoderConfig(codec=args.codec, h264_backend=args.h264_backend, start_bitrate=args.bitrate,
+                         min_bitrate=args.min_bitrate, max_bitrate=args.max_bitrate, gop=args.gop,
+                         preset=args.preset, cpu_used=args.cpu_used, frame_rate=args.frame_rate,
+                         threads=args.encoder_threads)
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import threading
+import time
+
+import aiortc.rtcrtpsender
+from aiohttp import web
+
+logger = logging.getLogger("rpi-webrtc")
+
+# 설정 변수
+POLL_INTERVAL = 5.0  # getStats() 폴링 주기 (초)
+POLL_TIMEOUT = 1.0  # 피어 하나의 getStats() 최대 대기 시간 (초)
+MAX_CONCURRENT_POLLS = 4  # 동시에 getStats()를 호출하는 피어 수
+MAX_PEERS_PER_POLL = 32  # 한 주기에 폴링하는 최대 피어 수 (나머지는 다음 주기에 순서대로)
+CLOCK_RATES = {"audio": 48000, "video": 90000}  # jitter(RTP 타임스탬프 단위) -> 초 변환용
+
+# 메트릭 이름: (타입, 설명)
+METRICS = {
+    "webrtc_peers": ("gauge", "Number of live peer connections"),
+    "webrtc_stats_polls_total": ("counter", "Number of getStats() polling cycles"),
+    "webrtc_stats_poll_timeouts_total": ("counter", "Number of getStats() calls that timed out"),
+    "webrtc_stats_poll_seconds": ("gauge", "Duration of the last polling cycle"),
+    "webrtc_outbound_bytes_total": ("counter", "RTP payload bytes sent"),
+    "webrtc_outbound_packets_total": ("counter", "RTP packets sent"),
+    "webrtc_outbound_bitrate_bps": ("gauge", "RTP send bitrate over the last polling interval"),
+    "webrtc_inbound_packets_total": ("counter", "RTP packets received"),
+    "webrtc_inbound_packets_lost_total": ("counter", "RTP packets lost on receive"),
+    "webrtc_inbound_jitter_seconds": ("gauge", "Interarrival jitter of received RTP"),
+    "webrtc_remote_packets_lost_total": ("counter", "Packets lost as reported by the remote receiver"),
+    "webrtc_remote_fraction_lost": ("gauge", "Fraction lost from the last remote receiver report (0-255)"),
+    "webrtc_remote_jitter_seconds": ("gauge", "Jitter from the last remote receiver report"),
+    "webrtc_rtt_seconds": ("gauge", "Round-trip time estimated from RTCP"),
+    "webrtc_transport_bytes_sent_total": ("counter", "Bytes sent on the ICE/DTLS transport"),
+    "webrtc_transport_bytes_received_total": ("counter", "Bytes received on the ICE/DTLS transport"),
+    "webrtc_transport_receive_bitrate_bps": ("gauge", "Transport receive bitrate over the last polling interval"),
+    "webrtc_encode_seconds_total": ("counter", "Time spent in encoder.encode()"),
+    "webrtc_encoded_frames_total": ("counter", "Frames passed to encoder.encode()"),
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class StatsExporter:
+    """
+    pcs에 있는 모든 PeerConnection의 getStats()를 주기적으로 모아 Prometheus 텍스트 포맷으로 내보낸다.
+    한 주기의 비용은 동시 호출 수, 피어당 타임아웃, 주기당 피어 수로 제한한다.
+    """
+
+    def __init__(self, pcs, interval=POLL_INTERVAL):
+        self.pcs = pcs
+        self.interval = interval
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self.task = None
+        self.cursor = 0
+
+        self.peer_ids = {}  # pc -> "pc<n>"
+        self.next_peer_id = 0
+        self.samples = {}  # peer id -> [(name, labels, value)]
+        self.previous = {}  # (peer id, stats id) -> (bytes, monotonic time)
+
+        self.polls_total = 0
+        self.poll_timeouts_total = 0
+        self.poll_seconds = 0.0
+
+        # 인코딩 시간은 aiortc 통계에 없으므로 인코더를 감싸서 직접 잰다 (워커 스레드에서 호출됨)
+        # 누적값은 인코더 객체에 두고, 폴링할 때 각 피어의 sender가 가진 인코더에서 읽어 피어별로 내보낸다
+        self.encode_lock = threading.Lock()
+
+    def setup(self, app):
+        app.router.add_get("/metrics", self.handle)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+
+    async def start(self, app=None):
+        self.install_encode_timer()
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self, app=None):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def install_encode_timer(self):
+        get_encoder = aiortc.rtcrtpsender.get_encoder
+
+        def timed_get_encoder(codec):
+            encoder = get_encoder(codec)
+            encode = encoder.encode
+            encoder.encode_codec = codec.mimeType
+            encoder.encode_totals = [0.0, 0]  # [seconds, frames]
+
+            def timed_encode(frame, force_keyframe=False):
+                start = time.perf_counter()
+                result = encode(frame, force_keyframe)
+                elapsed = time.perf_counter() - start
+                with self.encode_lock:
+                    encoder.encode_totals[0] += elapsed
+                    encoder.encode_totals[1] += 1
+                return result
+
+            encoder.encode = timed_encode
+            return encoder
+
+        aiortc.rtcrtpsender.get_encoder = timed_get_encoder
+
+    async def run(self):
+        while True:
+            start = time.monotonic()
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"getStats 폴링 오류: {e}")
+            self.poll_seconds = time.monotonic() - start
+            await asyncio.sleep(max(0.0, self.interval - self.poll_seconds))
+
+    async def poll(self):
+        peers = list(self.pcs)
+
+        # 끊긴 피어 정리
+        for pc in list(self.peer_ids):
+            if pc not in self.pcs:
+                peer_id = self.peer_ids.pop(pc)
+                self.samples.pop(peer_id, None)
+                for key in [key for key in self.previous if key[0] == peer_id]:
+                    del self.previous[key]
+
+        # 피어가 많으면 주기마다 MAX_PEERS_PER_POLL개씩 돌아가며 폴링
+        if len(peers) > MAX_PEERS_PER_POLL:
+            self.cursor %= len(peers)
+            peers = (peers[self.cursor:] + peers[:self.cursor])[:MAX_PEERS_PER_POLL]
+            self.cursor += MAX_PEERS_PER_POLL
+
+        await asyncio.gather(*[self.poll_peer(pc) for pc in peers])
+        self.polls_total += 1
+
+    async def poll_peer(self, pc):
+        async with self.semaphore:
+            try:
+                report = await asyncio.wait_for(pc.getStats(), POLL_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.poll_timeouts_total += 1
+                return
+            except Exception:
+                # 폴링 도중 닫힌 연결
+                return
+
+        if pc not in self.peer_ids:
+            self.peer_ids[pc] = f"pc{self.next_peer_id}"
+            self.next_peer_id += 1
+        peer_id = self.peer_ids[pc]
+        now = time.monotonic()
+
+        samples = []
+        for stats in report.values():
+            if stats.type == "transport":
+                labels = {"peer": peer_id, "transport": stats.id}
+                samples.append(("webrtc_transport_bytes_sent_total", labels, stats.bytesSent))
+                samples.append(("webrtc_transport_bytes_received_total", labels, stats.bytesReceived))
+                samples.append(("webrtc_transport_receive_bitrate_bps", labels,
+                                self.bitrate(peer_id, stats.id, stats.bytesReceived, now)))
+                continue
+
+            labels = {"peer": peer_id, "kind": stats.kind, "ssrc": stats.ssrc}
+            if stats.type == "outbound-rtp":
+                samples.append(("webrtc_outbound_bytes_total", labels, stats.bytesSent))
+                samples.append(("webrtc_outbound_packets_total", labels, stats.packetsSent))
+                samples.append(("webrtc_outbound_bitrate_bps", labels,
+                                self.bitrate(peer_id, stats.id, stats.bytesSent, now)))
+            elif stats.type == "inbound-rtp":
+                samples.append(("webrtc_inbound_packets_total", labels, stats.packetsReceived))
+                samples.append(("webrtc_inbound_packets_lost_total", labels, stats.packetsLost))
+                samples.append(("webrtc_inbound_jitter_seconds", labels,
+                                stats.jitter / CLOCK_RATES.get(stats.kind, 90000)))
+            elif stats.type == "remote-inbound-rtp":
+                samples.append(("webrtc_remote_packets_lost_total", labels, stats.packetsLost))
+                samples.append(("webrtc_remote_fraction_lost", labels, stats.fractionLost))
+                samples.append(("webrtc_remote_jitter_seconds", labels,
+                                stats.jitter / CLOCK_RATES.get(stats.kind, 90000)))
+                if stats.roundTripTime is not None:
+                    samples.append(("webrtc_rtt_seconds", labels, stats.roundTripTime))
+
+        # 인코딩 시간: sender가 만든 인코더 (첫 프레임을 보내기 전에는 없음)
+        for sender in pc.getSenders():
+            encoder = getattr(sender, "_RTCRtpSender__encoder", None)
+            totals = getattr(encoder, "encode_totals", None)
+            if totals is None:
+                continue
+            with self.encode_lock:
+                seconds, frames = totals
+            labels = {"peer": peer_id, "kind": sender.kind, "ssrc": sender._ssrc, "codec": encoder.encode_codec}
+            samples.append(("webrtc_encode_seconds_total", labels, seconds))
+            samples.append(("webrtc_encoded_frames_total", labels, frames))
+
+        self.samples[peer_id] = samples
+
+    def bitrate(self, peer_id, stats_id, total_bytes, now):
+        key = (peer_id, stats_id)
+        previous = self.previous.get(key)
+        self.previous[key] = (total_bytes, now)
+        if previous is None or now <= previous[1]:
+            return 0.0
+        return (total_bytes - previous[0]) * 8 / (now - previous[1])
+
+    def render(self):
+        grouped = {name: [] for name in METRICS}
+        grouped["webrtc_peers"].append(({}, len(self.pcs)))
+        grouped["webrtc_stats_polls_total"].append(({}, self.polls_total))
+        grouped["webrtc_stats_poll_timeouts_total"].append(({}, self.poll_timeouts_total))
+        grouped["webrtc_stats_poll_seconds"].append(({}, self.poll_seconds))
+        for samples in self.samples.values():
+            for name, labels, value in samples:
+                grouped[name].append((labels, value))
+
+        lines = []
+        for name, values in grouped.items():
+            if not values:
+                continue
+            metric_type, help_text = METRICS[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in values:
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, request):
+        # 요청마다 getStats()를 호출하지 않고 마지막 폴링 결과만 내보낸다
+        return web.Response(text=self.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
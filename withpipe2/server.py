@@ -6,15 +6,21 @@ import argparse
 import pyaudio
 import os
 import time
+import hashlib
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceServer
 from aiortc.contrib.media import MediaPlayer, MediaRecorder, MediaRelay
-from aiortc.mediastreams import AudioStreamTrack, VideoStreamTrack
+from aiortc.mediastreams import AudioStreamTrack, MediaStreamError, VideoStreamTrack
+from aiortc.rtp import RtcpRrPacket, RtcpSrPacket, RtcpPsfbPacket, RTCP_PSFB_APP, unpack_remb_fci
 from av import VideoFrame, AudioFrame
 import logging
 from fractions import Fraction
 from picamera2 import Picamera2
 
+from capture_thread import CaptureThread
+from encoder_config import EncoderConfig, add_encoder_arguments, config_from_args
+from metrics import StatsExporter
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rpi-webrtc")
@@ -22,53 +28,155 @@ logger = logging.getLogger("rpi-webrtc")
 # 설정 변수
 FRAME_WIDTH = 540
 FRAME_HEIGHT = 360
+LORES_WIDTH = 288  # 저해상도 레이어 (ISP에서 스케일, 종횡비 유지)
+LORES_HEIGHT = 192
 FPS = 25
 AUDIO_SAMPLE_RATE = 16000
 AUDIO_CHANNELS = 1
 CHUNK_SIZE = 640  # 0.04초 단위 (16000 * 0.2)
 FRAMES_PER_CHUNK = 1  # 0.04초 단위 (25fps * 0.2)
+CAPTURE_FORMAT = "YUV420"  # "YUV420": 인코더 입력 포맷 그대로 캡처, "RGB888": 기존 경로
+CPU_REPORT_INTERVAL = 250  # 이 프레임 수마다 프레임당 CPU 사용량 로그 (25fps 기준 10초)
+PC_POOL_SIZE = 2  # ICE 후보 수집까지 미리 끝내둔 PeerConnection 개수
+MIC_SLOTS = 10  # 마이크 캡처 스레드가 보관하는 청크 수 (0.4초), recv가 이보다 늦으면 오래된 청크부터 버림
+
+# 레이어 전환 기준 (수신자 RTCP 리포트 기반)
+LAYER_DOWN_LOSS = 0.10  # 손실률이 이 이상이면 lores로 내림
+LAYER_UP_LOSS = 0.02  # 손실률이 이 미만으로 유지되면 main으로 올림
+LAYER_DOWN_BITRATE = 300000  # REMB가 이 미만이면 lores로 내림 (bps)
+LAYER_UP_BITRATE = 500000  # REMB가 이 이상이어야 main으로 올림 (bps)
+LAYER_UP_HOLD = 5.0  # 올리기 전에 양호한 상태가 유지되어야 하는 시간 (초)
 
 # 오디오 재생 및 녹음 객체
 audio = pyaudio.PyAudio()
 
 
-# 비디오 스트림 트랙 클래스 정의
-class CameraVideoStreamTrack(VideoStreamTrack):
-    def __init__(self):
-        super().__init__()
-        # self.camera = cv2.VideoCapture(0)
-        # self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-        # self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
-        # self.camera.set(cv2.CAP_PROP_FPS, FPS)
+def yuv420_to_video_frame(buf, width, height):
+    """
+    Picamera2 YUV420(I420) 버퍼를 색공간 변환 없이 yuv420p VideoFrame으로 감싼다.
+    카메라 버퍼는 행마다 stride 패딩이 있을 수 있으므로 평면별로 한 번씩만 복사한다.
+    """
+    flat = buf.reshape(-1)
+    stride = buf.shape[1]
+    y_size = height * stride
+    uv_stride = stride // 2
+    uv_size = (height // 2) * uv_stride
+
+    planes = (
+        flat[:y_size].reshape(height, stride)[:, :width],
+        flat[y_size:y_size + uv_size].reshape(height // 2, uv_stride)[:, :width // 2],
+        flat[y_size + uv_size:y_size + 2 * uv_size].reshape(height // 2, uv_stride)[:, :width // 2],
+    )
+
+    frame = VideoFrame(width, height, "yuv420p")
+    for plane, src in zip(frame.planes, planes):
+        dst = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)
+        dst[:src.shape[0], :src.shape[1]] = src
+    return frame
+
+
+# 카메라 한 대를 모든 피어가 공유 (main + lores 두 레이어를 한 번의 캡처로 얻음)
+class SharedCamera:
+    def __init__(self, capture_format=CAPTURE_FORMAT):
+        self.capture_format = capture_format
         self.picam2 = Picamera2()
-        # 540x360, RGB888 포맷 설정
+        # main: 540x360, YUV420(기본) 또는 RGB888 / lores: 288x192 YUV420
+        # YUV420은 인코더가 받는 yuv420p와 같은 배치라 프레임마다 RGB->YUV 변환이 없다
+        # lores는 ISP가 스케일하므로 파이썬에서 리사이즈하지 않는다
         config = self.picam2.create_preview_configuration(
             main={
                 "size": (FRAME_WIDTH, FRAME_HEIGHT),
-                "format": "RGB888"
+                "format": capture_format
+            },
+            lores={
+                "size": (LORES_WIDTH, LORES_HEIGHT),
+                "format": "YUV420"
             }
         )
         self.picam2.configure(config)
         self.picam2.set_controls({"FrameRate": float(FPS)})
+        self.picam2.start()
+        # 캡처는 별도 스레드에서 하고 모든 피어의 트랙이 최신 프레임 슬롯을 함께 읽는다
+        self.frames = CaptureThread(self.capture, slots=1, name="picamera").start()
+
+    def capture(self):
+        # 캡처 스레드에서 호출: 한 번의 요청에서 두 레이어를 복사하고 버퍼는 바로 돌려줌
+        request = self.picam2.capture_request()
+        try:
+            return {
+                "main": request.make_array("main"),
+                "lores": request.make_array("lores"),
+            }
+        finally:
+            request.release()
+
+    def stop(self):
+        self.frames.stop()
+        self.picam2.stop()
+        self.picam2.close()
+
+
+# 비디오 스트림 트랙 클래스 정의
+class CameraVideoStreamTrack(VideoStreamTrack):
+    def __init__(self, camera, layer="main"):
+        super().__init__()
+        # self.camera = cv2.VideoCapture(0)
+        # self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        # self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+        # self.camera.set(cv2.CAP_PROP_FPS, FPS)
+        self.camera = camera
+        self.capture_format = camera.capture_format
+        # "main" 또는 "lores", LayerSelector가 수신 리포트에 따라 바꾼다
+        self.layer = layer
         self.frame_count = 0
+        self.seq = 0  # 마지막으로 보낸 캡처 번호
         self.relay = MediaRelay()
         self.last_frame_time = time.time()
 
         self.current_time = None
-        self.picam2.start()
+        # 프레임당 CPU 측정용 (캡처+래핑은 이 스레드, 인코딩은 aiortc 워커 스레드에서 수행)
+        self.wrap_cpu = 0.0
+        self.process_cpu_start = None
+        # offer 수신 시각 (offer -> 첫 프레임 시간 로그용, offer()에서 설정)
+        self.offer_time = None
 
     async def recv(self):
         if self.current_time is None:
             self.current_time = time.time()
-
-        frame = self.picam2.capture_array()  # shape: (height, width, 3)
+            self.process_cpu_start = time.process_time()
+            if self.offer_time is not None:
+                logger.info(f"offer -> first frame: {(time.monotonic() - self.offer_time) * 1000:.1f}ms")
+
+        found = await self.camera.frames.get(self.seq, latest=True)
+        if found is None:
+            raise MediaStreamError
+        self.seq, arrays = found
+
+        cpu_start = time.thread_time()
+        if self.layer == "lores":
+            video_frame = yuv420_to_video_frame(arrays["lores"], LORES_WIDTH, LORES_HEIGHT)
+        elif self.capture_format == "YUV420":
+            # shape: (height * 3 / 2, stride)
+            video_frame = yuv420_to_video_frame(arrays["main"], FRAME_WIDTH, FRAME_HEIGHT)
+        else:
+            # shape: (height, width, 3)
+            video_frame = VideoFrame.from_ndarray(arrays["main"], format="rgb24")
+        self.wrap_cpu += time.thread_time() - cpu_start
 
         # VideoFrame 생성
-        video_frame = VideoFrame.from_ndarray(frame, format="rgb24")
         video_frame.pts = self.frame_count
         video_frame.time_base = Fraction(1, FPS)
         self.frame_count += 1
 
+        if self.frame_count % CPU_REPORT_INTERVAL == 0:
+            # 프로세스 CPU에는 인코더의 색공간 변환/인코딩 비용까지 포함된다
+            process_cpu = time.process_time() - self.process_cpu_start
+            logger.info(
+                f"[{self.capture_format}] frames={self.frame_count} "
+                f"capture+wrap cpu={self.wrap_cpu / self.frame_count * 1000:.2f}ms/frame "
+                f"process cpu={process_cpu / self.frame_count * 1000:.2f}ms/frame"
+            )
+
         to_sleep = (1 / FPS) - (time.time() - self.current_time)
         if to_sleep > 0:
             await asyncio.sleep(to_sleep)
@@ -79,6 +187,63 @@ class CameraVideoStreamTrack(VideoStreamTrack):
         return video_frame
 
 
+# 피어별 레이어 선택 (RTCP 수신 리포트의 손실률 / REMB 기반)
+class LayerSelector:
+    def __init__(self, track):
+        self.track = track
+        self.sender = None
+        self.loss = 0.0
+        self.remb = None
+        self.good_since = None
+
+    def attach(self, sender):
+        # sender가 받는 RTCP 패킷을 먼저 살펴본 뒤 원래 처리로 넘긴다
+        self.sender = sender
+        handle_rtcp_packet = sender._handle_rtcp_packet
+
+        async def _handle_rtcp_packet(packet):
+            self.on_rtcp(packet)
+            await handle_rtcp_packet(packet)
+
+        sender._handle_rtcp_packet = _handle_rtcp_packet
+
+    def on_rtcp(self, packet):
+        if isinstance(packet, (RtcpRrPacket, RtcpSrPacket)):
+            for report in packet.reports:
+                if report.ssrc == self.sender._ssrc:
+                    self.loss = report.fraction_lost / 256
+                    self.update()
+        elif isinstance(packet, RtcpPsfbPacket) and packet.fmt == RTCP_PSFB_APP:
+            try:
+                bitrate, ssrcs = unpack_remb_fci(packet.fci)
+            except ValueError:
+                return
+            if self.sender._ssrc in ssrcs:
+                self.remb = bitrate
+                self.update()
+
+    def update(self):
+        if self.track.layer == "main":
+            if self.loss >= LAYER_DOWN_LOSS or (self.remb is not None and self.remb < LAYER_DOWN_BITRATE):
+                self.switch("lores")
+            return
+
+        # 올릴 때는 양호한 상태가 LAYER_UP_HOLD 동안 유지되어야 함 (왕복 전환 방지)
+        if self.loss < LAYER_UP_LOSS and (self.remb is None or self.remb >= LAYER_UP_BITRATE):
+            now = time.monotonic()
+            if self.good_since is None:
+                self.good_since = now
+            elif now - self.good_since >= LAYER_UP_HOLD:
+                self.switch("main")
+        else:
+            self.good_since = None
+
+    def switch(self, layer):
+        logger.info(f"layer {self.track.layer} -> {layer} (loss={self.loss:.1%}, remb={self.remb})")
+        self.track.layer = layer
+        self.good_since = None
+
+
 # 오디오 스트림 트랙 클래스 정의
 class MicrophoneAudioStreamTrack(AudioStreamTrack):
     def __init__(self):
@@ -90,9 +255,12 @@ class MicrophoneAudioStreamTrack(AudioStreamTrack):
 
         # 마이크 설정
         self.microphone = None
+        self.chunks = None  # 마이크를 읽는 캡처 스레드 (첫 recv에서 시작)
+        self.seq = 0
+        self.skipped = 0  # recv가 늦어 링에서 밀려난 청크 수
 
     async def recv(self):
-        if self.microphone is None:
+        if self.chunks is None:
             self.microphone = audio.open(
                 format=pyaudio.paInt16,
                 channels=self.channels,
@@ -100,8 +268,20 @@ class MicrophoneAudioStreamTrack(AudioStreamTrack):
                 input=True,
                 frames_per_buffer=CHUNK_SIZE
             )
-        # 0.2초 단위로 오디오 데이터 읽기 (16000 * 0.2 = 3200 샘플)
-        raw_samples = self.microphone.read(CHUNK_SIZE, exception_on_overflow=False)
+            # 0.04초 단위로 오디오 데이터 읽기 (16000 * 0.04 = 640 샘플), blocking read는 캡처 스레드에서
+            self.chunks = CaptureThread(
+                lambda: self.microphone.read(CHUNK_SIZE, exception_on_overflow=False),
+                slots=MIC_SLOTS, name="microphone"
+            ).start()
+
+        found = await self.chunks.get(self.seq)
+        if found is None:
+            raise MediaStreamError
+        seq, raw_samples = found
+        if seq - self.seq > 1:
+            self.skipped += seq - self.seq - 1
+            logger.warning(f"마이크 청크 {self.skipped}개 건너뜀 (recv 지연)")
+        self.seq = seq
 
         # 바이트를 numpy 배열로 변환
         samples = np.frombuffer(raw_samples, dtype=np.int16)
@@ -119,6 +299,14 @@ class MicrophoneAudioStreamTrack(AudioStreamTrack):
         self.pts += CHUNK_SIZE
         return frame
 
+    def stop(self):
+        super().stop()
+        if self.chunks is not None:
+            self.chunks.stop()
+            self.microphone.stop_stream()
+            self.microphone.close()
+            self.chunks = None
+
 
 # 오디오 출력 클래스 정의
 class AudioOutputTrack:
@@ -140,33 +328,113 @@ class AudioOutputTrack:
         self.audio_player.write(samples.tobytes())
 
 
+# 미리 만들어 둔 PeerConnection 풀
+class PeerConnectionPool:
+    """
+    오디오/비디오 트랜시버를 붙이고 ICE 후보 수집까지 끝낸 PeerConnection을 보관한다.
+    offer가 오면 준비된 연결을 꺼내 쓰고, 빈 자리는 백그라운드에서 다시 채운다.
+    """
+
+    def __init__(self, size=PC_POOL_SIZE):
+        self.size = size
+        self.ready = []
+        self.pending = 0
+
+    async def _create(self):
+        pc = RTCPeerConnection()
+        # addTrack()은 같은 kind의 빈 트랜시버를 재사용하므로 트랙 없이 미리 만들어 둔다
+        pc.addTransceiver("video", direction="sendrecv")
+        pc.addTransceiver("audio", direction="sendrecv")
+        gatherers = {t.sender.transport.transport.iceGatherer for t in pc.getTransceivers()}
+        # gather()는 이미 완료된 경우 다시 수집하지 않으므로 setLocalDescription()에서 대기가 없다
+        await asyncio.gather(*[g.gather() for g in gatherers])
+        return pc
+
+    async def _refill_one(self):
+        try:
+            pc = await self._create()
+        except Exception as e:
+            logger.warning(f"PeerConnection 미리 생성 실패: {e}")
+            return
+        finally:
+            self.pending -= 1
+        self.ready.append(pc)
+
+    def refill(self):
+        while len(self.ready) + self.pending < self.size:
+            self.pending += 1
+            asyncio.ensure_future(self._refill_one())
+
+    async def acquire(self):
+        if self.ready:
+            pc = self.ready.pop()
+        else:
+            logger.info("준비된 PeerConnection 없음, 새로 생성")
+            pc = RTCPeerConnection()
+        self.refill()
+        return pc
+
+    async def close(self):
+        await asyncio.gather(*[pc.close() for pc in self.ready])
+        self.ready.clear()
+
+
+# 정적 파일 캐시 (ETag 포함)
+class StaticAsset:
+    def __init__(self, path, content_type):
+        self.path = path
+        self.content_type = content_type
+        self.body = None
+        self.etag = None
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            self.body = f.read()
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+    def response(self, request):
+        if self.body is None:
+            self.load()
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=self.body, content_type=self.content_type, charset="utf-8", headers=headers)
+
+
 # WebRTC 연결 관리
 pcs = set()
 relay = MediaRelay()
 audio_output = AudioOutputTrack()
+pc_pool = PeerConnectionPool()
+stats_exporter = StatsExporter(pcs)
+encoder_config = EncoderConfig(frame_rate=FPS)  # 실행 시 명령행 인자로 다시 만들어 install()
+camera = None
+index_asset = StaticAsset(os.path.join(os.path.dirname(__file__), "index.html"), "text/html")
+js_asset = StaticAsset(os.path.join(os.path.dirname(__file__), "client.js"), "application/javascript")
 
 
 async def index(request):
-    content = open(os.path.join(os.path.dirname(__file__), "index.html"), "r").read()
-    return web.Response(content_type="text/html", text=content)
+    return index_asset.response(request)
 
 
 async def javascript(request):
-    content = open(os.path.join(os.path.dirname(__file__), "client.js"), "r").read()
-    return web.Response(content_type="application/javascript", text=content)
+    return js_asset.response(request)
 
 
 async def offer(request):
+    offer_time = time.monotonic()
     params = await request.json()
     offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
     print(offer.sdp)
 
-    pc = RTCPeerConnection()
+    pc = await pc_pool.acquire()
     pcs.add(pc)
 
     @pc.on("connectionstatechange")
     async def on_connectionstatechange():
         logger.info(f"Connection state is {pc.connectionState}")
+        if pc.connectionState in ("failed", "closed"):
+            mic_track.stop()  # 피어마다 연 마이크와 캡처 스레드 정리
         if pc.connectionState == "failed":
             await pc.close()
             pcs.discard(pc)
@@ -182,14 +450,24 @@ async def offer(request):
             def on_frame(frame):
                 audio_output.process_audio(frame)
 
-    # 라즈베리파이의 카메라와 마이크 트랙 추가
-    pc.addTrack(CameraVideoStreamTrack())
-    pc.addTrack(MicrophoneAudioStreamTrack())
+    # 라즈베리파이의 카메라와 마이크 트랙 추가 (카메라는 첫 offer에서 한 번만 연다)
+    global camera
+    if camera is None:
+        camera = SharedCamera(CAPTURE_FORMAT)
+    video_track = CameraVideoStreamTrack(camera, layer=params.get("layer", "main"))
+    video_track.offer_time = offer_time
+    video_sender = pc.addTrack(video_track)
+    LayerSelector(video_track).attach(video_sender)
+    # setRemoteDescription 전에 설정해야 answer의 코덱 선택에 반영됨
+    encoder_config.apply(next(t for t in pc.getTransceivers() if t.sender is video_sender))
+    mic_track = MicrophoneAudioStreamTrack()
+    pc.addTrack(mic_track)
 
     await pc.setRemoteDescription(offer)
     answer = await pc.createAnswer()
     await pc.setLocalDescription(answer)
     print("Answer SDP:\n", pc.localDescription.sdp)
+    logger.info(f"offer -> answer: {(time.monotonic() - offer_time) * 1000:.1f}ms")
 
     return web.Response(
         content_type="application/json",
@@ -200,11 +478,21 @@ async def offer(request):
     )
 
 
+async def on_startup(app):
+    # 정적 파일은 한 번만 읽고, PeerConnection 풀을 미리 채운다
+    index_asset.load()
+    js_asset.load()
+    pc_pool.refill()
+
+
 async def on_shutdown(app):
     # 연결 종료 처리
     coros = [pc.close() for pc in pcs]
     await asyncio.gather(*coros)
     pcs.clear()
+    await pc_pool.close()
+    if camera is not None:
+        camera.stop()
 
     # 오디오 리소스 해제
     audio.terminate()
@@ -331,16 +619,25 @@ if __name__ == "__main__":
 
     # 웹 서버 설정
     app = web.Application()
+    app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
     app.router.add_get("/", index)
     app.router.add_get("/client.js", javascript)
     app.router.add_post("/offer", offer)
+    stats_exporter.setup(app)  # /metrics (Prometheus)
 
     # 서버 실행
     parser = argparse.ArgumentParser(description="라즈베리파이 WebRTC 스트리밍 서버")
     parser.add_argument("--host", default="0.0.0.0", help="호스트 IP")
     parser.add_argument("--port", type=int, default=8080, help="포트 번호")
+    parser.add_argument("--capture-format", default=CAPTURE_FORMAT, choices=["YUV420", "RGB888"],
+                        help="카메라 캡처 포맷 (CPU 비교용)")
+    add_encoder_arguments(parser)
+    parser.set_defaults(frame_rate=FPS)  # x264 레이트 컨트롤을 실제 fps 기준으로
     args = parser.parse_args()
+    CAPTURE_FORMAT = args.capture_format
+    # 인코딩 시간 측정(stats_exporter)이 이 인코더를 감싸도록 서버 시작 전에 설치
+    encoder_config = config_from_args(args).install()
 
     logger.info(f"서버 시작: http://{args.host}:{args.port}")
     web.run_app(app, host=args.host, port=args.port)
\ No newline at end of file